@@ -0,0 +1,108 @@
+# analysis_cache.py – Position-keyed LRU cache of analysis shared by the ensemble
+
+from collections import OrderedDict
+
+from evaluation import evaluate
+
+DEFAULT_MAX_POSITIONS = 4096
+
+
+class PositionAnalysis:
+    """What is known about one position: legal moves, static scores, finished searches."""
+
+    __slots__ = ('legal_moves', 'evals', 'searches')
+
+    def __init__(self):
+        self.legal_moves = None
+        self.evals = {}      # color -> static score from color's side
+        self.searches = {}   # engine name -> (depth, packed move)
+
+
+class AnalysisCache:
+    """
+    Analysis keyed by Zobrist key (side to move, castling and en passant
+    included), evicting the least recently used position once max_positions
+    is reached. Search results are kept per engine with the depth they were
+    searched to, and only answer requests for that depth or less.
+    """
+
+    def __init__(self, max_positions=DEFAULT_MAX_POSITIONS):
+        self.max_positions = max_positions
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def _entry(self, key, create=False):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif create:
+            entry = self.entries[key] = PositionAnalysis()
+            if len(self.entries) > self.max_positions:
+                self.entries.popitem(last=False)
+        return entry
+
+    def legal_moves(self, pos):
+        entry = self._entry(pos.key, create=True)
+        if entry.legal_moves is None:
+            self.misses += 1
+            entry.legal_moves = pos.generate_legal_moves()
+        else:
+            self.hits += 1
+        return entry.legal_moves
+
+    def static_eval(self, pos, color):
+        entry = self._entry(pos.key, create=True)
+        score = entry.evals.get(color)
+        if score is None:
+            self.misses += 1
+            score = entry.evals[color] = evaluate(pos, color)
+        else:
+            self.hits += 1
+        return score
+
+    def search_result(self, key, engine, depth):
+        """The packed move engine found here at depth or deeper, else None."""
+        entry = self._entry(key)
+        result = entry.searches.get(engine) if entry is not None else None
+        if result is None or result[0] < depth:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result[1]
+
+    def store_search(self, key, engine, depth, move):
+        entry = self._entry(key, create=True)
+        current = entry.searches.get(engine)
+        if current is None or depth >= current[0]:
+            entry.searches[engine] = (depth, move)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# --- Shared cache ---
+_shared_cache = None
+
+
+def shared_cache(max_positions=DEFAULT_MAX_POSITIONS):
+    """The process-wide cache, kept for the whole game."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = AnalysisCache(max_positions)
+    return _shared_cache
+
+
+def reset_shared_cache(max_positions=DEFAULT_MAX_POSITIONS):
+    """Start a new game with an empty cache."""
+    global _shared_cache
+    _shared_cache = AnalysisCache(max_positions)
+    return _shared_cache
@@ -0,0 +1,834 @@
+# bitboard.py – Bitboard position core behind rules.py
+#
+# Squares are numbered to match the nested-list board used everywhere else:
+# sq = row * 8 + col, so square 0 is (0, 0) (a8, black's back rank) and
+# square 63 is (7, 7) (h1). White pawns move towards row 0.
+
+from evaluation import EG_PST, MG_PST, PHASE_BY_CODE
+
+WHITE, BLACK = 0, 1
+COLOR_NAMES = ('white', 'black')
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+# Same letters as the "white(p)" piece names; the knight is 'h'
+PIECE_LETTERS = 'phbrqk'
+LETTER_TO_TYPE = {letter: ptype for ptype, letter in enumerate(PIECE_LETTERS)}
+LETTER_TO_TYPE['n'] = KNIGHT  # python-chess style names are accepted too
+
+# Castling right bits
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+CASTLING_KEYS = (
+    (WHITE_KINGSIDE, 'white_kingside'),
+    (WHITE_QUEENSIDE, 'white_queenside'),
+    (BLACK_KINGSIDE, 'black_kingside'),
+    (BLACK_QUEENSIDE, 'black_queenside'),
+)
+
+FULL = (1 << 64) - 1
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def row_col(sq):
+    return sq >> 3, sq & 7
+
+
+def piece_name(color, ptype):
+    """Piece string as used by the nested-list board, e.g. 'white(q)'."""
+    return f"{COLOR_NAMES[color]}({PIECE_LETTERS[ptype]})"
+
+
+# --- Packed moves ---
+# Moves are 16-bit ints: bits 0-5 from square, bits 6-11 to square, bits
+# 12-14 promotion piece type (0 = none; pawns never promote so 0 is free).
+# Castling and en passant are recognised from the position when played.
+NULL_MOVE = 0
+
+
+def encode_move(frm, to, promotion=0):
+    return frm | (to << 6) | (promotion << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return move >> 12
+
+
+def move_to_dict(move):
+    """Convert a packed move to the {'from', 'to'} dict callers use."""
+    frm = move & 63
+    to = (move >> 6) & 63
+    move_dict = {'from': (frm >> 3, frm & 7), 'to': (to >> 3, to & 7)}
+    promotion = move >> 12
+    if promotion:
+        move_dict['promotion'] = PIECE_LETTERS[promotion]
+    return move_dict
+
+
+def move_from_dict(move_dict):
+    """Pack a {'from', 'to'} dict; an optional 'promotion' letter is honoured."""
+    promotion = move_dict.get('promotion')
+    return encode_move(square(*move_dict['from']), square(*move_dict['to']),
+                       LETTER_TO_TYPE[promotion] if promotion else 0)
+
+
+def iter_bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def lsb_square(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def msb_square(bb):
+    return bb.bit_length() - 1
+
+
+def popcount(bb):
+    return bin(bb).count('1')
+
+
+# --- Precomputed attack tables ---
+def _step_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = row_col(sq)
+        bb = 0
+        for dr, dc in offsets:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < 8 and 0 <= nc < 8:
+                bb |= 1 << square(nr, nc)
+        table.append(bb)
+    return table
+
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+KNIGHT_ATTACKS = _step_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _step_table(KING_OFFSETS)
+# PAWN_ATTACKS[color][sq]: squares a pawn of that colour on sq attacks
+PAWN_ATTACKS = (
+    _step_table([(-1, -1), (-1, 1)]),
+    _step_table([(1, -1), (1, 1)]),
+)
+
+# Ray directions as (drow, dcol). The first four run towards higher square
+# numbers, so their nearest blocker is the lowest set bit; the last four run
+# towards lower square numbers and use the highest set bit.
+ROOK_DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+POSITIVE_RAYS = (0, 1, 4, 5)
+NEGATIVE_RAYS = (2, 3, 6, 7)
+ALL_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _ray_table():
+    rays = []
+    for dr, dc in ALL_DIRECTIONS:
+        table = []
+        for sq in range(64):
+            r, c = row_col(sq)
+            bb = 0
+            r, c = r + dr, c + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                bb |= 1 << square(r, c)
+                r, c = r + dr, c + dc
+            table.append(bb)
+        rays.append(table)
+    return rays
+
+
+RAYS = _ray_table()
+
+
+def _between_table():
+    # BETWEEN[a][b]: squares strictly between a and b on a shared line, else 0
+    table = [[0] * 64 for _ in range(64)]
+    for d in range(8):
+        for a in range(64):
+            for b in iter_bits(RAYS[d][a]):
+                table[a][b] = RAYS[d][a] ^ RAYS[d][b] ^ (1 << b)
+    return table
+
+
+BETWEEN = _between_table()
+
+# Pawn ranks by colour, as rows of the nested-list board
+PAWN_START_ROW = (6, 1)
+PROMOTION_ROW = (0, 7)
+PAWN_PUSH = (-8, 8)
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# Piece values for static exchange evaluation; the king outweighs any trade
+SEE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+# Castling: (right bit, king from, king to, rook from, squares that must be
+# empty, squares the king passes through that must not be attacked)
+CASTLING_MOVES = (
+    (
+        (WHITE_KINGSIDE, 60, 62, 63, (1 << 61) | (1 << 62), (61, 62)),
+        (WHITE_QUEENSIDE, 60, 58, 56, (1 << 57) | (1 << 58) | (1 << 59), (59, 58)),
+    ),
+    (
+        (BLACK_KINGSIDE, 4, 6, 7, (1 << 5) | (1 << 6), (5, 6)),
+        (BLACK_QUEENSIDE, 4, 2, 0, (1 << 1) | (1 << 2) | (1 << 3), (3, 2)),
+    ),
+)
+
+
+def _ray_attacks(sq, occ, ray_ids):
+    attacks = 0
+    for d in ray_ids:
+        ray = RAYS[d][sq]
+        blockers = ray & occ
+        if blockers:
+            if d in POSITIVE_RAYS:
+                blocker = lsb_square(blockers)
+            else:
+                blocker = msb_square(blockers)
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occ):
+    return _ray_attacks(sq, occ, (0, 1, 2, 3))
+
+
+def bishop_attacks(sq, occ):
+    return _ray_attacks(sq, occ, (4, 5, 6, 7))
+
+
+def queen_attacks(sq, occ):
+    return _ray_attacks(sq, occ, (0, 1, 2, 3, 4, 5, 6, 7))
+
+
+# Castling rights that survive a move touching each square: moving the king
+# or a rook, or capturing a rook on its corner, clears the matching rights.
+CASTLING_KEEP = [0b1111] * 64
+CASTLING_KEEP[60] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_KEEP[63] &= ~WHITE_KINGSIDE
+CASTLING_KEEP[56] &= ~WHITE_QUEENSIDE
+CASTLING_KEEP[4] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_KEEP[7] &= ~BLACK_KINGSIDE
+CASTLING_KEEP[0] &= ~BLACK_QUEENSIDE
+
+
+# --- Zobrist keys ---
+def _zobrist_tables(seed=0x5EED):
+    import random
+    rng = random.Random(seed)
+    pieces = [[rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+    castling = [0] * 16
+    rights = [rng.getrandbits(64) for _ in range(4)]
+    for mask in range(16):
+        for i in range(4):
+            if mask & (1 << i):
+                castling[mask] ^= rights[i]
+    en_passant_files = [rng.getrandbits(64) for _ in range(8)]
+    return pieces, castling, en_passant_files, rng.getrandbits(64)
+
+
+ZOBRIST_PIECES, ZOBRIST_CASTLING, ZOBRIST_EN_PASSANT, ZOBRIST_BLACK_TO_MOVE = _zobrist_tables()
+
+
+# --- Position ---
+class Position:
+    """
+    Chess position stored as one bitboard per colour and piece type, plus a
+    64-entry mailbox for O(1) "what is on this square" lookups.
+
+    Piece codes are color * 6 + ptype, so bitboards[WHITE * 6 + QUEEN] holds
+    the white queens.
+    """
+
+    __slots__ = ('bitboards', 'occupancy', 'mailbox', 'turn', 'castling',
+                 'en_passant', 'halfmove_clock', 'fullmove_number', 'key',
+                 'mg_score', 'eg_score', 'phase')
+
+    def __init__(self):
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.mailbox = [None] * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.key = 0
+        # White-minus-black evaluation sums, see evaluation.py
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+
+    # --- Nested-list adapter ---
+    @classmethod
+    def from_board(cls, board, turn='white', en_passant_target=None, castling_rights=None):
+        """
+        Build a position from the 8x8 list-of-lists board used by rules.py.
+        en_passant_target is a (row, col) tuple and castling_rights the
+        {'white_kingside': bool, ...} dict, both as rules.py takes them.
+        """
+        pos = cls()
+        for r in range(8):
+            row = board[r]
+            for c in range(8):
+                piece = row[c]
+                if piece:
+                    paren = piece.index('(')
+                    color = WHITE if piece[:paren] == 'white' else BLACK
+                    ptype = LETTER_TO_TYPE[piece[paren + 1].lower()]
+                    pos.put_piece(color * 6 + ptype, r * 8 + c)
+        pos.turn = WHITE if turn == 'white' else BLACK
+        if en_passant_target is not None:
+            pos.en_passant = square(*en_passant_target)
+        if castling_rights:
+            for bit, key in CASTLING_KEYS:
+                if castling_rights.get(key, False):
+                    pos.castling |= bit
+        pos.key = pos.compute_key()
+        return pos
+
+    def to_board(self):
+        """Return the nested-list board for this position."""
+        board = [[None] * 8 for _ in range(8)]
+        for sq, code in enumerate(self.mailbox):
+            if code is not None:
+                board[sq >> 3][sq & 7] = piece_name(code // 6, code % 6)
+        return board
+
+    def en_passant_target(self):
+        return row_col(self.en_passant) if self.en_passant is not None else None
+
+    def castling_rights(self):
+        return {key: bool(self.castling & bit) for bit, key in CASTLING_KEYS}
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.bitboards = self.bitboards[:]
+        pos.occupancy = self.occupancy[:]
+        pos.mailbox = self.mailbox[:]
+        pos.turn = self.turn
+        pos.castling = self.castling
+        pos.en_passant = self.en_passant
+        pos.halfmove_clock = self.halfmove_clock
+        pos.fullmove_number = self.fullmove_number
+        pos.key = self.key
+        pos.mg_score = self.mg_score
+        pos.eg_score = self.eg_score
+        pos.phase = self.phase
+        return pos
+
+    def compute_key(self):
+        """Zobrist key from scratch; make/unmake keep self.key in step incrementally."""
+        key = ZOBRIST_CASTLING[self.castling]
+        for sq, code in enumerate(self.mailbox):
+            if code is not None:
+                key ^= ZOBRIST_PIECES[code][sq]
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant & 7]
+        if self.turn == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    # --- Piece placement ---
+    def put_piece(self, code, sq):
+        bit = 1 << sq
+        self.bitboards[code] |= bit
+        self.occupancy[code // 6] |= bit
+        self.mailbox[sq] = code
+        self.key ^= ZOBRIST_PIECES[code][sq]
+        self.mg_score += MG_PST[code][sq]
+        self.eg_score += EG_PST[code][sq]
+        self.phase += PHASE_BY_CODE[code]
+
+    def remove_piece(self, sq):
+        code = self.mailbox[sq]
+        bit = 1 << sq
+        self.bitboards[code] ^= bit
+        self.occupancy[code // 6] ^= bit
+        self.mailbox[sq] = None
+        self.key ^= ZOBRIST_PIECES[code][sq]
+        self.mg_score -= MG_PST[code][sq]
+        self.eg_score -= EG_PST[code][sq]
+        self.phase -= PHASE_BY_CODE[code]
+        return code
+
+    def pieces(self, color, ptype):
+        return self.bitboards[color * 6 + ptype]
+
+    def all_occupied(self):
+        return self.occupancy[WHITE] | self.occupancy[BLACK]
+
+    def king_square(self, color):
+        kings = self.bitboards[color * 6 + KING]
+        return lsb_square(kings) if kings else None
+
+    def piece_at(self, sq):
+        """(color, ptype) on sq, or None if the square is empty."""
+        code = self.mailbox[sq]
+        return None if code is None else (code // 6, code % 6)
+
+    def attacks_from(self, code, sq, occ=None):
+        """Squares attacked by the piece `code` standing on sq."""
+        if occ is None:
+            occ = self.all_occupied()
+        ptype = code % 6
+        if ptype == PAWN:
+            return PAWN_ATTACKS[code // 6][sq]
+        if ptype == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        if ptype == BISHOP:
+            return bishop_attacks(sq, occ)
+        if ptype == ROOK:
+            return rook_attacks(sq, occ)
+        if ptype == QUEEN:
+            return queen_attacks(sq, occ)
+        return KING_ATTACKS[sq]
+
+    # --- Attack queries ---
+    def attackers_to(self, sq, by_color, occ=None):
+        """Bitboard of by_color pieces attacking sq, looking outward from sq."""
+        if occ is None:
+            occ = self.all_occupied()
+        bbs = self.bitboards
+        base = by_color * 6
+        attackers = (PAWN_ATTACKS[by_color ^ 1][sq] & bbs[base + PAWN]) \
+            | (KNIGHT_ATTACKS[sq] & bbs[base + KNIGHT]) \
+            | (KING_ATTACKS[sq] & bbs[base + KING])
+        queens = bbs[base + QUEEN]
+        diagonal = bbs[base + BISHOP] | queens
+        if diagonal:
+            attackers |= bishop_attacks(sq, occ) & diagonal
+        straight = bbs[base + ROOK] | queens
+        if straight:
+            attackers |= rook_attacks(sq, occ) & straight
+        return attackers
+
+    def see(self, move):
+        """
+        Static exchange evaluation of a capture (or any move) in centipawns:
+        the material the side to move ends up with if both sides keep
+        recapturing on the target square with their least valuable attacker,
+        each free to stop when continuing would lose material. X-ray
+        attackers behind a capturing slider join in; pins are ignored.
+        """
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = move >> 12
+        mailbox = self.mailbox
+        bbs = self.bitboards
+        occ = self.all_occupied()
+
+        target = mailbox[to]
+        attacker = mailbox[frm] % 6
+        gain = [0] * 34
+        if target is not None:
+            gain[0] = SEE_VALUES[target % 6]
+        elif attacker == PAWN and to == self.en_passant:
+            gain[0] = SEE_VALUES[PAWN]
+            occ ^= 1 << (to - PAWN_PUSH[self.turn])
+        if promotion:
+            gain[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+            attacker = promotion
+
+        occ ^= 1 << frm
+        side = self.turn ^ 1
+        depth = 0
+        while True:
+            depth += 1
+            # Speculative score if the piece now on the square is taken
+            gain[depth] = SEE_VALUES[attacker] - gain[depth - 1]
+            if max(-gain[depth - 1], gain[depth]) < 0:
+                break  # neither side can improve by continuing
+            candidates = self.attackers_to(to, side, occ) & occ
+            if not candidates:
+                break
+            base = side * 6
+            for ptype in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+                pieces = candidates & bbs[base + ptype]
+                if pieces:
+                    break
+            occ ^= pieces & -pieces
+            attacker = ptype
+            side ^= 1
+
+        while depth > 1:
+            depth -= 1
+            gain[depth - 1] = -max(-gain[depth - 1], gain[depth])
+        return gain[0]
+
+    def is_square_attacked(self, sq, by_color, occ=None):
+        return self.attackers_to(sq, by_color, occ) != 0
+
+    def in_check(self, color=None):
+        if color is None:
+            color = self.turn
+        ks = self.king_square(color)
+        return ks is not None and self.is_square_attacked(ks, color ^ 1)
+
+    # --- Legal move generation ---
+    def _pin_masks(self, us, ks, occ):
+        """
+        Map each of our pinned pieces to the ray it may still move along
+        (from the king up to and including the pinning piece).
+        """
+        them = us ^ 1
+        bbs = self.bitboards
+        queens = bbs[them * 6 + QUEEN]
+        straight = bbs[them * 6 + ROOK] | queens
+        diagonal = bbs[them * 6 + BISHOP] | queens
+        own = self.occupancy[us]
+        pins = {}
+        for d in range(8):
+            sliders = straight if d < 4 else diagonal
+            ray = RAYS[d][ks]
+            if not ray & sliders:
+                continue
+            blockers = ray & occ
+            if not blockers:
+                continue
+            first = lsb_square(blockers) if d in POSITIVE_RAYS else msb_square(blockers)
+            if not (own >> first) & 1:
+                continue
+            beyond = RAYS[d][first] & occ
+            if not beyond:
+                continue
+            second = lsb_square(beyond) if d in POSITIVE_RAYS else msb_square(beyond)
+            if (sliders >> second) & 1:
+                pins[first] = ray ^ RAYS[d][second]
+        return pins
+
+    def generate_legal_moves(self, captures_only=False, quiets_only=False, from_mask=FULL):
+        """
+        Legal moves for the side to move as packed ints (see encode_move).
+        With captures_only, just captures (en passant included) and
+        promotions, as quiescence search wants; with quiets_only, the rest.
+        from_mask restricts generation to pieces standing on those squares.
+
+        Only pseudo-legal destinations are generated per piece type; legality
+        comes from the check-evasion mask and the pin rays rather than from
+        playing each move and testing for check.
+        """
+        us = self.turn
+        them = us ^ 1
+        bbs = self.bitboards
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occ = own | enemy
+        moves = []
+        if captures_only:
+            destinations = enemy
+        elif quiets_only:
+            destinations = ~occ
+        else:
+            destinations = ~own
+
+        ks = self.king_square(us)
+        if ks is None:
+            checkers = 0
+            pins = {}
+        else:
+            checkers = self.attackers_to(ks, them, occ)
+            pins = self._pin_masks(us, ks, occ)
+
+            # King moves: test each target with the king lifted off the board
+            # so it cannot hide behind itself from a slider.
+            if (from_mask >> ks) & 1:
+                occ_no_king = occ ^ (1 << ks)
+                for to in iter_bits(KING_ATTACKS[ks] & destinations):
+                    if not self.attackers_to(to, them, occ_no_king):
+                        moves.append(ks | (to << 6))
+
+        if checkers & (checkers - 1):
+            return moves  # double check: only the king may move
+
+        if checkers:
+            checker = lsb_square(checkers)
+            check_mask = checkers | BETWEEN[ks][checker]
+        else:
+            check_mask = FULL
+            if not captures_only and (from_mask >> ks) & 1:
+                self._castling_moves(us, ks, occ, moves)
+
+        targets = destinations & check_mask
+        base = us * 6
+
+        for ptype in (KNIGHT, BISHOP, ROOK, QUEEN):
+            for frm in iter_bits(bbs[base + ptype] & from_mask):
+                if ptype == KNIGHT:
+                    if frm in pins:
+                        continue  # a pinned knight can never move
+                    dests = KNIGHT_ATTACKS[frm]
+                elif ptype == BISHOP:
+                    dests = bishop_attacks(frm, occ)
+                elif ptype == ROOK:
+                    dests = rook_attacks(frm, occ)
+                else:
+                    dests = queen_attacks(frm, occ)
+                dests &= targets
+                if frm in pins:
+                    dests &= pins[frm]
+                for to in iter_bits(dests):
+                    moves.append(frm | (to << 6))
+
+        push = PAWN_PUSH[us]
+        start_row = PAWN_START_ROW[us]
+        promotion_row = PROMOTION_ROW[us]
+        ep = self.en_passant
+        for frm in iter_bits(bbs[base + PAWN] & from_mask):
+            allowed = check_mask & pins.get(frm, FULL)
+            one = frm + push
+            promoting = one >> 3 == promotion_row
+            if quiets_only:
+                # Promotions count as tactical moves, so they are not quiet
+                dests = 0
+                if not promoting and not (occ >> one) & 1:
+                    dests = 1 << one
+                    two = one + push
+                    if frm >> 3 == start_row and not (occ >> two) & 1:
+                        dests |= 1 << two
+                for to in iter_bits(dests & allowed):
+                    moves.append(frm | (to << 6))
+                continue
+            dests = PAWN_ATTACKS[us][frm] & enemy
+            if not (occ >> one) & 1 and (not captures_only or promoting):
+                dests |= 1 << one
+                two = one + push
+                if frm >> 3 == start_row and not captures_only and not (occ >> two) & 1:
+                    dests |= 1 << two
+            dests &= allowed
+            for to in iter_bits(dests):
+                if to >> 3 == promotion_row:
+                    for promo in PROMOTION_TYPES:
+                        moves.append(frm | (to << 6) | (promo << 12))
+                else:
+                    moves.append(frm | (to << 6))
+            if ep is not None and (PAWN_ATTACKS[us][frm] >> ep) & 1:
+                if self._en_passant_is_legal(us, frm, ep, ks, occ):
+                    moves.append(frm | (ep << 6))
+        return moves
+
+    def _en_passant_is_legal(self, us, frm, ep, ks, occ):
+        # En passant lifts two pawns off one rank, which pin rays alone do not
+        # capture, so the resulting occupancy is checked directly.
+        if ks is None:
+            return True
+        captured = ep - PAWN_PUSH[us]
+        after = occ ^ (1 << frm) ^ (1 << ep) ^ (1 << captured)
+        return not self.attackers_to(ks, us ^ 1, after) & ~(1 << captured)
+
+    def _castling_moves(self, us, ks, occ, moves):
+        rights = self.castling
+        if not rights:
+            return
+        them = us ^ 1
+        rooks = self.bitboards[us * 6 + ROOK]
+        for bit, king_from, king_to, rook_from, empty, path in CASTLING_MOVES[us]:
+            if not rights & bit or ks != king_from or occ & empty:
+                continue
+            if not (rooks >> rook_from) & 1:
+                continue
+            if any(self.is_square_attacked(sq, them, occ) for sq in path):
+                continue
+            moves.append(king_from | (king_to << 6))
+
+    # --- Make / unmake ---
+    def make_move(self, move):
+        """
+        Play a packed move in place and return the undo
+        record for unmake_move: (captured code, previous castling rights,
+        previous en passant square, previous halfmove clock, previous key).
+        The Zobrist key is updated incrementally by the piece moves below.
+        """
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = move >> 12
+        mailbox = self.mailbox
+        code = mailbox[frm]
+        us = self.turn
+        ptype = code - us * 6
+        captured = mailbox[to]
+        undo = (captured, self.castling, self.en_passant, self.halfmove_clock, self.key)
+
+        if captured is not None:
+            self.remove_piece(to)
+        self.remove_piece(frm)
+        self.en_passant = None
+        self.halfmove_clock += 1
+
+        if ptype == PAWN:
+            self.halfmove_clock = 0
+            if to == undo[2]:
+                # En passant: the captured pawn sits behind the target square
+                captured_sq = to - PAWN_PUSH[us]
+                self.remove_piece(captured_sq)
+            elif to - frm == 2 * PAWN_PUSH[us]:
+                self.en_passant = frm + PAWN_PUSH[us]
+            if promotion:
+                code = us * 6 + promotion
+        elif ptype == KING and abs(to - frm) == 2:
+            rook_from, rook_to = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+            self.put_piece(self.remove_piece(rook_from), rook_to)
+
+        if captured is not None:
+            self.halfmove_clock = 0
+        self.put_piece(code, to)
+        castling = undo[1] & CASTLING_KEEP[frm] & CASTLING_KEEP[to]
+        key = self.key ^ ZOBRIST_BLACK_TO_MOVE
+        if castling != undo[1]:
+            key ^= ZOBRIST_CASTLING[undo[1]] ^ ZOBRIST_CASTLING[castling]
+            self.castling = castling
+        if undo[2] is not None:
+            key ^= ZOBRIST_EN_PASSANT[undo[2] & 7]
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant & 7]
+        self.key = key
+        if us == BLACK:
+            self.fullmove_number += 1
+        self.turn = us ^ 1
+        return undo
+
+    def unmake_move(self, move, undo):
+        """Take back a move played with make_move, restoring its undo record."""
+        frm = move & 63
+        to = (move >> 6) & 63
+        captured, self.castling, self.en_passant, self.halfmove_clock, key = undo
+        self.turn = us = self.turn ^ 1
+        if us == BLACK:
+            self.fullmove_number -= 1
+
+        code = self.remove_piece(to)
+        ptype = code - us * 6
+        if move >> 12:
+            code = us * 6 + PAWN
+            ptype = PAWN
+        self.put_piece(code, frm)
+
+        if captured is not None:
+            self.put_piece(captured, to)
+        elif ptype == PAWN and to == self.en_passant:
+            self.put_piece((us ^ 1) * 6 + PAWN, to - PAWN_PUSH[us])
+        elif ptype == KING and abs(to - frm) == 2:
+            rook_from, rook_to = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+            self.put_piece(self.remove_piece(rook_to), rook_from)
+        self.key = key
+
+    def make_null_move(self):
+        """
+        Pass the turn without moving, for null-move pruning. Returns the
+        undo record for unmake_null_move: (en passant square, key).
+        """
+        undo = (self.en_passant, self.key)
+        key = self.key ^ ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant & 7]
+            self.en_passant = None
+        self.key = key
+        self.turn ^= 1
+        return undo
+
+    def unmake_null_move(self, undo):
+        self.en_passant, self.key = undo
+        self.turn ^= 1
+
+    def has_non_pawn_material(self, color):
+        """Whether color has anything besides pawns and the king (no zugzwang worries)."""
+        bbs = self.bitboards
+        base = color * 6
+        return bool(bbs[base + KNIGHT] | bbs[base + BISHOP] | bbs[base + ROOK] | bbs[base + QUEEN])
+
+    def is_legal(self, move):
+        """Whether a packed move (e.g. from the hash table) is legal here."""
+        if not move:
+            return False
+        frm = move & 63
+        code = self.mailbox[frm]
+        if code is None or code // 6 != self.turn:
+            return False
+        return move in self.generate_legal_moves(from_mask=1 << frm)
+
+    def is_tactical(self, move):
+        """Captures and promotions, the moves quiescence search looks at."""
+        return move >> 12 != 0 or self.is_capture(move)
+
+    def is_capture(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        return self.mailbox[to] is not None or (
+            to == self.en_passant and self.mailbox[frm] % 6 == PAWN)
+
+
+# --- Incremental attack maps ---
+class AttackMap:
+    """
+    Attack sets of every piece of a position, kept up to date incrementally.
+
+    After the position changes, call update() with a bitboard of the squares
+    whose contents changed (for a quiet move, just from and to). Only pieces
+    standing on those squares, and sliders whose rays reached one of them,
+    are recomputed. Useful for king-safety terms and repeated attack queries
+    on the same position.
+    """
+
+    __slots__ = ('position', 'attacks_by_square')
+
+    def __init__(self, position):
+        self.position = position
+        self.attacks_by_square = [0] * 64
+        self.rebuild()
+
+    def rebuild(self):
+        pos = self.position
+        occ = pos.all_occupied()
+        table = self.attacks_by_square
+        for sq, code in enumerate(pos.mailbox):
+            table[sq] = 0 if code is None else pos.attacks_from(code, sq, occ)
+
+    def update(self, changed):
+        pos = self.position
+        bbs = pos.bitboards
+        occ = pos.all_occupied()
+        table = self.attacks_by_square
+        sliders = 0
+        for color in (WHITE, BLACK):
+            base = color * 6
+            sliders |= bbs[base + BISHOP] | bbs[base + ROOK] | bbs[base + QUEEN]
+        dirty = changed
+        for sq in iter_bits(sliders & ~changed):
+            if table[sq] & changed:
+                dirty |= 1 << sq
+        mailbox = pos.mailbox
+        for sq in iter_bits(dirty):
+            code = mailbox[sq]
+            table[sq] = 0 if code is None else pos.attacks_from(code, sq, occ)
+
+    def attacks(self, color):
+        """Union of all squares attacked by color."""
+        table = self.attacks_by_square
+        attacked = 0
+        for sq in iter_bits(self.position.occupancy[color]):
+            attacked |= table[sq]
+        return attacked
+
+    def attackers_to(self, sq, color):
+        table = self.attacks_by_square
+        bit = 1 << sq
+        attackers = 0
+        for frm in iter_bits(self.position.occupancy[color]):
+            if table[frm] & bit:
+                attackers |= 1 << frm
+        return attackers
@@ -0,0 +1,137 @@
+# chess_bridge.py – Direct conversion between bitboard positions and python-chess boards
+#
+# Both sides keep one bitboard per piece type, but python-chess numbers
+# squares from a1 while bitboard.py starts at a8, so a bitboard converts
+# with a vertical flip and a square with sq ^ 56. No FEN string is built.
+
+import chess
+
+from bitboard import (BLACK, BLACK_KINGSIDE, BLACK_QUEENSIDE, WHITE, WHITE_KINGSIDE,
+                      WHITE_QUEENSIDE, Position)
+
+# Castling right bit -> python-chess rook square bitboard
+CASTLING_ROOKS = (
+    (WHITE_KINGSIDE, chess.BB_H1),
+    (WHITE_QUEENSIDE, chess.BB_A1),
+    (BLACK_KINGSIDE, chess.BB_H8),
+    (BLACK_QUEENSIDE, chess.BB_A8),
+)
+
+
+# --- Positions ---
+def position_to_chess(pos):
+    """A chess.Board for pos with castling rights, en passant square and clocks."""
+    board = chess.Board(None)
+    bbs = [chess.flip_vertical(bb) for bb in pos.bitboards]
+    board.pawns = bbs[0] | bbs[6]
+    board.knights = bbs[1] | bbs[7]
+    board.bishops = bbs[2] | bbs[8]
+    board.rooks = bbs[3] | bbs[9]
+    board.queens = bbs[4] | bbs[10]
+    board.kings = bbs[5] | bbs[11]
+    board.occupied_co[chess.WHITE] = chess.flip_vertical(pos.occupancy[WHITE])
+    board.occupied_co[chess.BLACK] = chess.flip_vertical(pos.occupancy[BLACK])
+    board.occupied = board.occupied_co[chess.WHITE] | board.occupied_co[chess.BLACK]
+    board.promoted = chess.BB_EMPTY
+    board.turn = chess.WHITE if pos.turn == WHITE else chess.BLACK
+    board.castling_rights = 0
+    for bit, rook in CASTLING_ROOKS:
+        if pos.castling & bit:
+            board.castling_rights |= rook
+    board.ep_square = pos.en_passant ^ 56 if pos.en_passant is not None else None
+    board.halfmove_clock = pos.halfmove_clock
+    board.fullmove_number = pos.fullmove_number
+    return board
+
+
+def chess_to_position(board):
+    """The bitboard Position for a chess.Board, with the same game state."""
+    pos = Position()
+    for code in range(12):
+        color = chess.WHITE if code < 6 else chess.BLACK
+        for sq in chess.scan_forward(board.pieces_mask(code % 6 + 1, color)):
+            pos.put_piece(code, sq ^ 56)
+    pos.turn = WHITE if board.turn == chess.WHITE else BLACK
+    for bit, rook in CASTLING_ROOKS:
+        if board.castling_rights & rook:
+            pos.castling |= bit
+    pos.en_passant = board.ep_square ^ 56 if board.ep_square is not None else None
+    pos.halfmove_clock = board.halfmove_clock
+    pos.fullmove_number = board.fullmove_number
+    pos.key = pos.compute_key()
+    return pos
+
+
+def board_to_chess(board, turn='white', en_passant_target=None, castling_rights=None,
+                   halfmove_clock=0, fullmove_number=1):
+    """A chess.Board straight from the nested-list board and the rules.py game state."""
+    pos = Position.from_board(board, turn, en_passant_target, castling_rights)
+    pos.halfmove_clock = halfmove_clock
+    pos.fullmove_number = fullmove_number
+    return position_to_chess(pos)
+
+
+# --- Moves ---
+def move_to_chess(move):
+    """Packed move -> chess.Move."""
+    promotion = move >> 12
+    return chess.Move((move & 63) ^ 56, ((move >> 6) & 63) ^ 56,
+                      promotion + 1 if promotion else None)
+
+
+def move_from_chess(move):
+    """chess.Move -> packed move."""
+    promotion = move.promotion - 1 if move.promotion else 0
+    return (move.from_square ^ 56) | ((move.to_square ^ 56) << 6) | (promotion << 12)
+
+
+# --- Incremental sync ---
+class ChessBoardSync:
+    """
+    A chess.Board kept in step with a bitboard Position. Moves are pushed
+    to both; sync() catches up with a later position by finding the
+    (at most max_plies) moves that lead there and pushing them, and only
+    rebuilds the board when no such line exists.
+    """
+
+    def __init__(self, pos):
+        self.reset(pos)
+
+    def reset(self, pos):
+        self.position = pos.copy()
+        self.board = position_to_chess(pos)
+
+    def push(self, move):
+        self.position.make_move(move)
+        self.board.push(move_to_chess(move))
+
+    def pop(self):
+        """Take back the last pushed move (the bitboard side is rebuilt from the board)."""
+        self.board.pop()
+        self.position = chess_to_position(self.board)
+
+    def sync(self, pos, max_plies=2):
+        """Bring the board to pos and return it."""
+        if pos.key != self.position.key:
+            line = self._find_line(self.position.copy(), pos.key, max_plies)
+            if line is None:
+                self.reset(pos)
+            else:
+                for move in line:
+                    self.push(move)
+        return self.board
+
+    def _find_line(self, current, key, plies):
+        if plies == 0:
+            return None
+        for move in current.generate_legal_moves():
+            undo = current.make_move(move)
+            if current.key == key:
+                line = [move]
+            else:
+                rest = self._find_line(current, key, plies - 1)
+                line = [move] + rest if rest is not None else None
+            current.unmake_move(move, undo)
+            if line is not None:
+                return line
+        return None
@@ -1,137 +1,277 @@
 # custalgo_killer.py – Killer Move Search Chess AI
 
-import time
-import copy
+from functools import partial
+
+from bitboard import NULL_MOVE, Position, move_to_dict
+from evaluation import evaluate
+from move_ordering import MAX_PLY, OrderingTables, staged_moves
+from parallel_search import split_root
+from search_common import (can_scout, deepen, futility_score, is_futile, null_move_window,
+                           probe_tt, scout_window, selective_candidate, store_tt, try_null_move)
+from search_options import DEFAULT_OPTIONS
+from time_manager import TimeManager
+from transposition import shared_table
 
 INFINITY = float('inf')
-KILLER_MOVES = {}  # {depth: [killer1, killer2]}
+TT_NAME = 'killer'
+# Half-width of the first aspiration window around the previous score (centipawns)
+ASPIRATION_WINDOW = 50
+MAX_ASPIRATION_WINDOW = 800
 
-def killer_iterative_deepening(board, max_time, get_legal_moves, make_move, undo_move, evaluate, max_depth=5):
-    global KILLER_MOVES
-    KILLER_MOVES = {}
-    start_time = time.time()
-    best_move = None
+def killer_iterative_deepening(pos, time_manager, evaluate, max_depth=5, tt=None, options=None,
+                               stats=None):
+    """
+    Deepen one ply at a time. Killers, history and counter-moves live in a
+    fresh OrderingTables for this search, each iteration starts from the
+    previous principal variation, and from depth 2 on the root is searched
+    with an aspiration window around the previous score.
 
-    for depth in range(1, max_depth + 1):
-        move, _ = killer_alpha_beta(
-            board, depth, -INFINITY, INFINITY,
-            True, get_legal_moves, make_move, undo_move, evaluate,
-            start_time, max_time
-        )
+    No iteration starts past the time manager's soft limit; one interrupted
+    by the hard limit is discarded, keeping the last completed result.
+    Completed iterations, re-searches included, are reported to stats.
+    """
+    tables = OrderingTables()
+    score = None
+
+    def search(root, depth):
+        nonlocal score
+        # Mate scores are infinite, so there is no window to centre on them
+        if score is None or depth < 2 or abs(score) == INFINITY:
+            alpha, beta = -INFINITY, INFINITY
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        delta = ASPIRATION_WINDOW
+        while True:
+            move, new_score = killer_alpha_beta(
+                root, depth, alpha, beta,
+                True, evaluate, time_manager, tt=tt, tables=tables, options=options,
+                stats=stats
+            )
+            # Outside the window the score is only a bound: widen and re-search
+            delta *= 2
+            if new_score <= alpha and alpha != -INFINITY:
+                alpha = -INFINITY if delta > MAX_ASPIRATION_WINDOW else new_score - delta
+            elif new_score >= beta and beta != INFINITY:
+                beta = INFINITY if delta > MAX_ASPIRATION_WINDOW else new_score + delta
+            else:
+                break
         if move:
-            best_move = move
-        if time.time() - start_time >= max_time:
-            break
-    return best_move
+            score = new_score
+        tables.remember_pv(pos)
+        return new_score, move
 
-def killer_alpha_beta(board, depth, alpha, beta, maximizing_player,
-                     get_legal_moves, make_move, undo_move, evaluate,
-                     start_time, max_time, current_depth=0):
-    if time.time() - start_time >= max_time:
-        return None, 0
+    return deepen(pos, range(1, min(max_depth, MAX_PLY - 1) + 1), search, time_manager, stats,
+                  principal_variation=lambda root, depth, move: tables.principal_variation())
 
+def search_child(pos, move, depth, alpha, beta, maximizing_player, evaluate, time_manager,
+                 current_depth, tt, tables, options, reduction=0, stats=None):
+    """
+    Score the position move (already made) leads to. A reduced late move
+    gets a shallow null-window look first and is only searched to full
+    depth if that look beats the window.
+    """
+    if reduction and can_scout(alpha, beta, maximizing_player):
+        _, score = killer_alpha_beta(
+            pos, depth - 1 - reduction, *scout_window(alpha, beta, maximizing_player),
+            not maximizing_player, evaluate, time_manager, current_depth + 1, tt, tables, move,
+            options, stats
+        )
+        if (score <= alpha) if maximizing_player else (score >= beta):
+            return score
+    _, score = killer_alpha_beta(
+        pos, depth - 1, alpha, beta, not maximizing_player,
+        evaluate, time_manager, current_depth + 1, tt, tables, move, options, stats
+    )
+    return score
+
+def killer_alpha_beta(pos, depth, alpha, beta, maximizing_player,
+                     evaluate, time_manager, current_depth=0, tt=None,
+                     tables=None, prev_move=0, options=None, stats=None):
+    """
+    options: see search_options.SearchOptions. stats: see
+    search_stats.SearchStats.
+    """
+    # Past the hard limit this raises SearchTimeout; no partial score escapes
+    time_manager.tick()
+    if stats is not None:
+        stats.nodes += 1
+    if tables is not None:
+        tables.clear_pv(current_depth)
+
+    in_check = False
+    if options is not None:
+        in_check = pos.in_check()
+        depth += options.extension(current_depth, depth, in_check)
     if depth == 0:
-        return None, evaluate(board)
+        return None, evaluate(pos)
 
-    best_move = None
-    moves = get_legal_moves(board)
-    killers = KILLER_MOVES.get(current_depth, [])
-    ordered_moves = killers + [m for m in moves if m not in killers]
+    sign = 1 if maximizing_player else -1
+    if options is not None:
+        tb_score = options.tablebase_score(pos, current_depth)
+        if tb_score is not None:
+            return None, sign * tb_score
+    alpha_orig, beta_orig = alpha, beta
+    hash_move, alpha, beta, cutoff = probe_tt(tt, pos, depth, alpha, beta, sign, current_depth,
+                                              stats)
+    if cutoff is not None:
+        value, move = cutoff
+        return move, value
 
+    futility = None
+    if options is not None:
+        static_score = evaluate(pos)
+        if try_null_move(options, pos, depth, current_depth, prev_move, in_check, static_score,
+                         alpha, beta, maximizing_player):
+            undo = pos.make_null_move()
+            _, null_score = killer_alpha_beta(
+                pos, options.null_move_depth(depth),
+                *null_move_window(alpha, beta, maximizing_player),
+                not maximizing_player, evaluate, time_manager, current_depth + 1, tt,
+                tables, NULL_MOVE, options, stats
+            )
+            pos.unmake_null_move(undo)
+            if maximizing_player and null_score >= beta:
+                return None, beta
+            if not maximizing_player and null_score <= alpha:
+                return None, alpha
+        futility = futility_score(options, depth, in_check, static_score, maximizing_player)
+
+    # The previous iteration's PV move takes the hash move's slot
+    if tables is not None:
+        hash_move = tables.pv_move(pos) or hash_move
+
+    best_move = None
+    searched = 0
     if maximizing_player:
         max_eval = -INFINITY
-        for move in ordered_moves:
-            sr, sc = move['from']
-            er, ec = move['to']
-            captured_piece = board[er][ec]
-            make_move(board, move)
-            _, eval_score = killer_alpha_beta(
-                board, depth - 1, alpha, beta, False,
-                get_legal_moves, make_move, undo_move, evaluate,
-                start_time, max_time, current_depth + 1
+        for move in staged_moves(pos, hash_move, tables, current_depth, prev_move):
+            quiet = selective_candidate(options, pos, move, searched, in_check)
+            undo = pos.make_move(move)
+            reduction = 0
+            if quiet and not pos.in_check():
+                if is_futile(futility, alpha, beta, True):
+                    pos.unmake_move(move, undo)
+                    max_eval = max(max_eval, futility)
+                    continue
+                reduction = options.reduction(depth, searched, True)
+            searched += 1
+            eval_score = search_child(
+                pos, move, depth, alpha, beta, True, evaluate, time_manager,
+                current_depth, tt, tables, options, reduction, stats
             )
-            undo_move(board, move, captured_piece)
-            if eval_score > max_eval:
+            pos.unmake_move(move, undo)
+            if eval_score > max_eval or best_move is None:
                 max_eval = eval_score
                 best_move = move
+                if tables is not None:
+                    tables.update_pv(current_depth, move)
             if max_eval > alpha:
                 alpha = max_eval
             if alpha >= beta:
-                # Store killer move
-                if current_depth not in KILLER_MOVES:
-                    KILLER_MOVES[current_depth] = []
-                if move not in KILLER_MOVES[current_depth]:
-                    KILLER_MOVES[current_depth].append(move)
-                    KILLER_MOVES[current_depth] = KILLER_MOVES[current_depth][:2]
+                if tables is not None:
+                    tables.record_cutoff(pos, move, depth, current_depth, prev_move)
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.first_move_cutoffs += searched == 1
                 break
+        if best_move is None:
+            return None, (-INFINITY if pos.in_check() else 0)
+        store_tt(tt, pos, depth, max_eval, alpha_orig, beta_orig, sign, best_move)
         return best_move, max_eval
     else:
         min_eval = INFINITY
-        for move in ordered_moves:
-            sr, sc = move['from']
-            er, ec = move['to']
-            captured_piece = board[er][ec]
-            make_move(board, move)
-            _, eval_score = killer_alpha_beta(
-                board, depth - 1, alpha, beta, True,
-                get_legal_moves, make_move, undo_move, evaluate,
-                start_time, max_time, current_depth + 1
+        for move in staged_moves(pos, hash_move, tables, current_depth, prev_move):
+            quiet = selective_candidate(options, pos, move, searched, in_check)
+            undo = pos.make_move(move)
+            reduction = 0
+            if quiet and not pos.in_check():
+                if is_futile(futility, alpha, beta, False):
+                    pos.unmake_move(move, undo)
+                    min_eval = min(min_eval, futility)
+                    continue
+                reduction = options.reduction(depth, searched, True)
+            searched += 1
+            eval_score = search_child(
+                pos, move, depth, alpha, beta, False, evaluate, time_manager,
+                current_depth, tt, tables, options, reduction, stats
             )
-            undo_move(board, move, captured_piece)
-            if eval_score < min_eval:
+            pos.unmake_move(move, undo)
+            if eval_score < min_eval or best_move is None:
                 min_eval = eval_score
                 best_move = move
+                if tables is not None:
+                    tables.update_pv(current_depth, move)
             if min_eval < beta:
                 beta = min_eval
             if alpha >= beta:
-                # Store killer move
-                if current_depth not in KILLER_MOVES:
-                    KILLER_MOVES[current_depth] = []
-                if move not in KILLER_MOVES[current_depth]:
-                    KILLER_MOVES[current_depth].append(move)
-                    KILLER_MOVES[current_depth] = KILLER_MOVES[current_depth][:2]
+                if tables is not None:
+                    tables.record_cutoff(pos, move, depth, current_depth, prev_move)
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.first_move_cutoffs += searched == 1
                 break
+        if best_move is None:
+            return None, (INFINITY if pos.in_check() else 0)
+        store_tt(tt, pos, depth, min_eval, alpha_orig, beta_orig, sign, best_move)
         return best_move, min_eval
 
+def score_root_move(pos, move, depth, alpha, tt, tables, time_manager, evaluate, options):
+    """parallel_search hook: score the root move just made on pos for the root player."""
+    _, score = killer_alpha_beta(
+        pos, depth - 1, alpha, INFINITY, False, evaluate, time_manager, 1, tt, tables, move,
+        options
+    )
+    return score
+
 # Example usage wrapper
 def get_killer_ai_move(
-    board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move,
-    max_time=2.0, eval_fn=None
+    board, player, depth, generate_all_moves=None, is_valid_move=None, make_move=None,
+    undo_move=None, max_time=2.0, eval_fn=None, en_passant_target=None, castling_rights=None,
+    tt=None, time_left=None, increment=0.0, time_manager=None, options=None, workers=1,
+    stats=None
 ):
-    """Replacement for get_ai_move, using killer algorithm and iterative deepening."""
-    # You likely already have an evaluate function or can define:
-    if eval_fn is None:
-        def eval_fn(b):
-            # Just simple count, you can plug your own.
-            PIECE_VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 1000}
-            score = 0
-            for row in b:
-                for piece in row:
-                    if piece:
-                        value = PIECE_VALUES.get(piece.upper(), 0)
-                        if piece.startswith(player):
-                            score += value
-                        else:
-                            score -= value
-            return score
+    """
+    Replacement for get_ai_move, using killer algorithm and iterative deepening.
+    The search runs on a bitboard Position with reversible make/unmake, so
+    eval_fn, if given, is called with that Position. The move callbacks are
+    accepted for compatibility with existing callers. tt defaults to this
+    engine's shared transposition table only when the default evaluation is used,
+    since cached scores must come from the same evaluation.
 
-    # Provide "get_legal_moves" where only moves for 'player' are generated:
-    def get_legal_moves_for_player(b):
-        return generate_all_moves(b, player)
-
-    # Support make/undo with captured pieces
-    def move_maker(b, m):
-        sr, sc = m['from']
-        er, ec = m['to']
-        b[er][ec] = b[sr][sc]
-        b[sr][sc] = None
-
-    def undo_maker(b, m, captured):
-        sr, sc = m['from']
-        er, ec = m['to']
-        b[sr][sc] = b[er][ec]
-        b[er][ec] = captured
-
-    return killer_iterative_deepening(
-        board, max_time, get_legal_moves_for_player, move_maker, undo_maker, eval_fn, max_depth=depth
-    )
+    max_time is the hard limit for this move. With time_left and increment
+    (the game clock, in seconds) the budget is derived from the clock
+    instead, capped by max_time; a ready TimeManager overrides both.
+
+    options: see search_options.SearchOptions.
+
+    workers > 1 splits the root moves over that many processes (see
+    parallel_search); eval_fn must then be picklable, e.g. a module-level
+    function or a functools.partial of one. stats: see search_stats.SearchStats.
+    """
+    pos = Position.from_board(board, player, en_passant_target, castling_rights)
+    color = pos.turn
+
+    default_eval = eval_fn is None
+    if default_eval:
+        if tt is None:
+            tt = shared_table(TT_NAME)
+        # Shared incremental evaluation; you can plug your own.
+        eval_fn = partial(evaluate, color=color)
+
+    if tt is not None:
+        tt.new_search()
+    if time_manager is None:
+        time_manager = TimeManager.for_move(max_time, time_left, increment)
+    if options is None:
+        options = DEFAULT_OPTIONS
+    best_move = options.tablebase_move(pos)
+    if best_move:
+        return move_to_dict(best_move)
+    if workers > 1:
+        # Workers only use their process-wide tables with the default evaluation
+        best_move = split_root(score_root_move, pos, depth, workers, time_manager,
+                               (eval_fn, options), TT_NAME if default_eval else None)
+    else:
+        best_move = killer_iterative_deepening(pos, time_manager, eval_fn, max_depth=depth,
+                                               tt=tt, options=options, stats=stats)
+    return move_to_dict(best_move) if best_move else None
@@ -1,179 +1,358 @@
 # custalgo_mcts.py
 import random
 import math
+from array import array
 import chess
-import chess.syzygy
 
-# Optional: Set to your Syzygy tablebase path or None if unavailable
-TABLEBASE_PATH = None  
-try:
-    tablebase = chess.syzygy.open_tablebase(TABLEBASE_PATH) if TABLEBASE_PATH else None
-except Exception:
-    tablebase = None
+from bitboard import move_to_dict
+from chess_bridge import board_to_chess, chess_to_position, move_from_chess
+from evaluation import evaluate
+from tablebase import shared_service
+from time_manager import SearchTimeout, TimeManager
 
-def to_pythonchess_board(board_array, turn="white"):
+# Playouts: at most MAX_PLAYOUT_PLIES random plies; every EVAL_CHECK_PLIES the
+# static evaluation may end one early once a side is EVAL_CUTOFF centipawns
+# ahead. Captures are played with probability CAPTURE_BIAS when available.
+MAX_PLAYOUT_PLIES = 40
+EVAL_CHECK_PLIES = 4
+EVAL_CUTOFF = 500
+CAPTURE_BIAS = 0.75
+# Iterations per unit of depth; playouts are cheap enough for far more than before
+ITERATIONS_PER_DEPTH = 100
+# Playouts between reports to a SearchStats
+STATS_INTERVAL = 100
+
+# Playout plies are far costlier than alpha-beta nodes, so read the clock sooner
+CLOCK_CHECK_PLIES = 64
+
+def to_pythonchess_board(board_array, turn="white", en_passant_target=None, castling_rights=None):
     """
-    Convert your custom 8x8 board array to python-chess Board object.
-    Your board: (0,0) = top-left, python-chess expects rank 8 at top.
+    Convert your custom 8x8 board array to a python-chess Board, keeping
+    the en passant target and castling rights. Built straight from the
+    piece bitboards by chess_bridge, without a FEN round-trip.
     """
-    piece_map = {'p': 'p', 'r': 'r', 'h': 'n', 'n': 'n', 'b': 'b', 'q': 'q', 'k': 'k'}
-    rows_fen = []
-    
-    # Process rows from top to bottom (rank 8 to rank 1 in chess notation)
-    for row in board_array:
-        fen_row = ""
-        empty_count = 0
-        for piece in row:
-            if piece is None:
-                empty_count += 1
-            else:
-                if empty_count > 0:
-                    fen_row += str(empty_count)
-                    empty_count = 0
-                try:
-                    color, descr = piece.split("(")
-                    name = descr[0].lower()
-                    fen_piece = piece_map.get(name, '?')
-                    fen_row += fen_piece.upper() if color == "white" else fen_piece.lower()
-                except Exception:
-                    fen_row += '?'
-        if empty_count > 0:
-            fen_row += str(empty_count)
-        rows_fen.append(fen_row)
-    
-    fen_position = "/".join(rows_fen)
-    fen_turn = 'w' if turn == 'white' else 'b'
-    fen = f"{fen_position} {fen_turn} - - 0 1"
-    
-    try:
-        board = chess.Board(fen)
-        return board
-    except ValueError:
-        return chess.Board()  # fallback to default position
+    return board_to_chess(board_array, turn, en_passant_target, castling_rights)
 
 def to_move_tuple(move):
     """
-    Convert python-chess Move to your internal move dict format.
-    
-    Python-chess: square 0 = a1 (bottom-left), square 63 = h8 (top-right)
-    Your board: (0,0) = top-left, (7,7) = bottom-right
-    
-    Need to flip the rank (row) coordinate.
+    Convert python-chess Move to your internal move dict format, with a
+    'promotion' letter for promotions.
     """
-    from_rank, from_file = divmod(move.from_square, 8)
-    to_rank, to_file = divmod(move.to_square, 8)
-    
-    # Convert python-chess ranks (0=bottom) to your array rows (0=top)
-    from_row = 7 - from_rank
-    to_row = 7 - to_rank
-    
-    return {'from': (from_row, from_file), 'to': (to_row, to_file)}
-
-class Node:
-    def __init__(self, board, parent=None, move=None):
-        self.board = board
-        self.parent = parent
-        self.move = move
-        self.children = []
-        self.visits = 0
-        self.wins = 0
-
-    def is_fully_expanded(self):
-        return len(self.children) == len(list(self.board.legal_moves))
-
-    def best_child(self, c_param=1.4):
-        def uct(child):
-            if child.visits == 0:
-                return float('inf')
-            exploitation = child.wins / child.visits
-            exploration = c_param * math.sqrt(math.log(self.visits) / child.visits)
-            return exploitation + exploration
-        if not self.children:
-            return None
-        return max(self.children, key=uct)
+    return move_to_dict(move_from_chess(move))
 
-def syzygy_score(board):
-    if not tablebase or not board.is_valid() or board.is_game_over():
-        return 0
-    try:
-        return tablebase.probe_wdl(board)
-    except Exception:
-        return 0
+# --- Node store ---
+def encode_move(move):
+    """python-chess Move -> 16-bit int (from | to << 6 | promotion << 12)."""
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
 
-def select_promising_node(node):
-    while node.children:
-        node = node.best_child()
-        if node is None:
-            break
-    return node
-
-def expand_node(node):
-    tried_moves = {child.move for child in node.children}
-    for move in node.board.legal_moves:
-        if move not in tried_moves:
-            new_board = node.board.copy()
-            new_board.push(move)
-            child_node = Node(new_board, node, move)
-            node.children.append(child_node)
-            return child_node
-    return node
-
-def simulate_random_playout(node):
-    board = node.board.copy()
-    while not board.is_game_over():
-        moves = list(board.legal_moves)
-        if not moves:
-            break
-        best_move = None
+def decode_move(code):
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
+
+class NodeStore:
+    """
+    The search tree as parallel arrays indexed by node number: visits,
+    wins, parent, the move leading to the node, and the node's children
+    as one contiguous block (first_child, child_count). A node costs about
+    two dozen bytes instead of a Board copy and a dict.
+
+    Expanding a node allocates a child for every legal move at once; the
+    children with no visits are its untried moves. Boards are not stored:
+    the search replays moves from root_board on the way down.
+
+    wins[n] is counted for the side that played the move into node n.
+    """
+
+    __slots__ = ('root_board', 'visits', 'wins', 'parent', 'move', 'first_child',
+                 'child_count')
+
+    def __init__(self, root_board):
+        self.root_board = root_board.copy(stack=False)
+        self.visits = array('I')
+        self.wins = array('d')
+        self.parent = array('i')
+        self.move = array('H')
+        self.first_child = array('i')   # -1 until the node is expanded
+        self.child_count = array('H')
+        self.add_node(-1, 0)
+
+    def __len__(self):
+        return len(self.visits)
+
+    def add_node(self, parent, move_code):
+        self.visits.append(0)
+        self.wins.append(0.0)
+        self.parent.append(parent)
+        self.move.append(move_code)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        return len(self.visits) - 1
+
+    def is_expanded(self, node):
+        return self.first_child[node] >= 0
+
+    def expand(self, node, board):
+        """Add a child per legal move of board (the position at node)."""
+        self.first_child[node] = len(self.visits)
+        count = 0
+        for move in board.legal_moves:
+            self.add_node(node, encode_move(move))
+            count += 1
+        self.child_count[node] = count
+
+    def children(self, node):
+        first = self.first_child[node]
+        return range(first, first + self.child_count[node]) if first >= 0 else range(0)
+
+    def best_child(self, node, c_param=1.4):
+        """Highest UCT score; an untried child is always picked first."""
+        visits = self.visits
+        wins = self.wins
+        log_parent = math.log(max(1, visits[node]))
+        best = -1
         best_score = -float('inf')
-        for move in moves:
-            board.push(move)
-            score = syzygy_score(board)
-            board.pop()
+        for child in self.children(node):
+            child_visits = visits[child]
+            if child_visits == 0:
+                return child
+            score = wins[child] / child_visits + c_param * math.sqrt(log_parent / child_visits)
             if score > best_score:
                 best_score = score
-                best_move = move
-        board.push(best_move if best_move else random.choice(moves))
-    return board.result()
-
-def backpropagate(node, result):
-    while node:
-        node.visits += 1
-        if (result == "1-0" and node.board.turn == chess.BLACK) or (result == "0-1" and node.board.turn == chess.WHITE):
-            node.wins += 1
-        elif result == "1/2-1/2":
-            node.wins += 0.5
-        node = node.parent
-
-def hybrid_mcts(board_array, player_color, iterations=75):
+                best = child
+        return best
+
+    def most_visited_child(self, node):
+        children = self.children(node)
+        if not children:
+            return -1
+        # Ties (common with few iterations) go to the child with more wins
+        return max(children, key=lambda child: (self.visits[child], self.wins[child]))
+
+    def subtree(self, node, board):
+        """
+        A new store holding only node's subtree, with board (the position
+        at node) as its root; everything else is dropped.
+        """
+        tree = NodeStore(board)
+        tree.visits[0] = self.visits[node]
+        tree.wins[0] = self.wins[node]
+        pending = [(node, 0)]
+        while pending:
+            old, new = pending.pop()
+            if not self.is_expanded(old):
+                continue
+            tree.first_child[new] = len(tree.visits)
+            tree.child_count[new] = self.child_count[old]
+            for child in self.children(old):
+                copy = tree.add_node(new, self.move[child])
+                tree.visits[copy] = self.visits[child]
+                tree.wins[copy] = self.wins[child]
+            first = tree.first_child[new]
+            for offset, child in enumerate(self.children(old)):
+                pending.append((child, first + offset))
+        return tree
+
+def syzygy_score(board):
+    """WDL for the side to move (2 win ... -2 loss), or None when not covered."""
+    return shared_service().probe_wdl(board)
+
+def evaluate_chess_board(board):
+    """The shared tapered evaluation of a python-chess board, centipawns for white."""
+    return evaluate(chess_to_position(board), 0)
+
+def win_probability(score):
+    """Expected result for white from a centipawn score (logistic, 400cp scale)."""
+    return 1.0 / (1.0 + 10.0 ** (-score / 400.0))
+
+def select_and_expand(tree):
+    """
+    Walk down by UCT from the root, replaying moves on a copy of the root
+    board, until reaching an untried child, a terminal node or a node that
+    is expanded here for the first time. Returns (path, board).
+    """
+    board = tree.root_board.copy(stack=False)
+    node = 0
+    path = [0]
+    while True:
+        if not tree.is_expanded(node):
+            if board.is_game_over():
+                break
+            tree.expand(node, board)
+        child = tree.best_child(node)
+        if child < 0:
+            break
+        board.push(decode_move(tree.move[child]))
+        path.append(child)
+        if tree.visits[child] == 0:
+            break
+        node = child
+    return path, board
+
+def choose_playout_move(board):
+    """A random legal move, biased towards captures."""
+    if random.random() < CAPTURE_BIAS:
+        captures = list(board.generate_legal_captures())
+        if captures:
+            return random.choice(captures)
+    return random.choice(list(board.legal_moves))
+
+def simulate_random_playout(board, time_manager=None, max_plies=MAX_PLAYOUT_PLIES, stats=None):
+    """
+    Play random capture-biased moves from board and return white's
+    expected result in [0, 1]. The playout ends at a finished game, a
+    tablebase hit, a static score beyond EVAL_CUTOFF, or after max_plies,
+    where the static evaluation is turned into a win probability. Plies
+    played are counted as stats.qnodes.
+    """
+    board = board.copy(stack=False)
+    for ply in range(max_plies):
+        if stats is not None:
+            stats.qnodes += 1
+        outcome = board.outcome()
+        if outcome is not None:
+            return 0.5 if outcome.winner is None else float(outcome.winner == chess.WHITE)
+        wdl = syzygy_score(board)
+        if wdl is not None:
+            # Cursed wins and blessed losses (+-1) are draws under the 50-move rule
+            if abs(wdl) < 2:
+                return 0.5
+            return float((wdl > 0) == (board.turn == chess.WHITE))
+        if ply and ply % EVAL_CHECK_PLIES == 0:
+            score = evaluate_chess_board(board)
+            if abs(score) >= EVAL_CUTOFF:
+                return win_probability(score)
+        if time_manager is not None:
+            time_manager.tick()
+        board.push(choose_playout_move(board))
+    outcome = board.outcome()
+    if outcome is not None:
+        return 0.5 if outcome.winner is None else float(outcome.winner == chess.WHITE)
+    return win_probability(evaluate_chess_board(board))
+
+def backpropagate(tree, path, result):
+    """result is white's expected score; each node is credited for the side that moved into it."""
+    mover = not tree.root_board.turn
+    for node in path:
+        tree.visits[node] += 1
+        tree.wins[node] += result if mover == chess.WHITE else 1.0 - result
+        mover = not mover
+
+def principal_line(tree, max_length=MAX_PLAYOUT_PLIES):
+    """The most visited line from the root, as python-chess Moves."""
+    line = []
+    node = tree.most_visited_child(0)
+    while node >= 0 and tree.visits[node] and len(line) < max_length:
+        line.append(decode_move(tree.move[node]))
+        node = tree.most_visited_child(node)
+    return line
+
+def report_stats(tree, stats):
+    """One SearchStats iteration: PV length as depth, the best root move's win rate as score."""
+    line = principal_line(tree)
+    best = tree.most_visited_child(0)
+    score = tree.wins[best] / tree.visits[best] if best >= 0 and tree.visits[best] else 0.5
+    stats.end_iteration(len(line), score, [move.uci() for move in line], deepening=False)
+    stats.begin_iteration()
+
+# --- Tree reuse ---
+# Tree of the last search; the next call continues from the node for the
+# position it is asked about, so statistics for the expected lines carry over.
+_last_tree = None
+
+def position_id(board):
+    return board.board_fen(), board.turn
+
+def find_reusable_root(board, max_plies=2):
+    """
+    The previous tree cut down to the node for board's position, looked up
+    at most max_plies below the old root (our move plus the opponent's
+    reply), or None.
+    """
+    if _last_tree is None:
+        return None
+    target = position_id(board)
+    frontier = [(0, _last_tree.root_board)]
+    for _ in range(max_plies + 1):
+        next_frontier = []
+        for node, node_board in frontier:
+            if position_id(node_board) == target:
+                return _last_tree.subtree(node, node_board) if node else _last_tree
+            for child in _last_tree.children(node):
+                child_board = node_board.copy(stack=False)
+                child_board.push(decode_move(_last_tree.move[child]))
+                next_frontier.append((child, child_board))
+        frontier = next_frontier
+    return None
+
+def reset_tree():
+    """Forget the kept tree, e.g. when a new game starts."""
+    global _last_tree
+    _last_tree = None
+
+def hybrid_mcts(board_array, player_color, iterations=75, time_manager=None, reuse_tree=True,
+                en_passant_target=None, castling_rights=None, stats=None):
+    """
+    stats, a search_stats.SearchStats, counts tree nodes walked as nodes and
+    playout plies as qnodes, with a report every STATS_INTERVAL playouts.
+    """
+    global _last_tree
     turn = "white" if player_color == "white" else "black"
-    board = to_pythonchess_board(board_array, turn=turn)
+    board = to_pythonchess_board(board_array, turn, en_passant_target, castling_rights)
     if board.is_game_over():
         return None
+    # In the tables the answer is known: play the DTZ-best move
+    tb_moves = shared_service().root_moves(board)
+    if tb_moves:
+        return tb_moves[0]
     
-    root = Node(board)
+    tree = find_reusable_root(board) if reuse_tree else None
+    if tree is None:
+        tree = NodeStore(board)
+    # Only the kept subtree survives; the rest of the old tree is dropped
+    _last_tree = tree if reuse_tree else None
+    if stats is not None:
+        stats.begin_iteration()
+    playouts = 0
     for _ in range(iterations):
-        promising_node = select_promising_node(root)
-        if promising_node is None or promising_node.board.is_game_over():
-            continue
-        node = expand_node(promising_node)
-        result = simulate_random_playout(node)
-        backpropagate(node, result)
+        # Soft limit: no new playout; hard limit: drop the one in progress
+        if time_manager is not None and tree.is_expanded(0) and not time_manager.can_start_iteration():
+            break
+        path, leaf_board = select_and_expand(tree)
+        try:
+            result = simulate_random_playout(leaf_board, time_manager, stats=stats)
+        except SearchTimeout:
+            break
+        backpropagate(tree, path, result)
+        playouts += 1
+        if stats is not None:
+            stats.nodes += len(path)
+            if playouts % STATS_INTERVAL == 0:
+                report_stats(tree, stats)
+    if stats is not None and playouts % STATS_INTERVAL:
+        report_stats(tree, stats)
     
-    if not root.children:
+    best = tree.most_visited_child(0)
+    if best < 0:
         return None
-    best_move = max(root.children, key=lambda c: c.visits).move
-    return best_move
+    return decode_move(tree.move[best])
 
-def get_mcts_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move):
+def get_mcts_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move,
+                     max_time=None, time_left=None, increment=0.0, time_manager=None,
+                     en_passant_target=None, castling_rights=None, stats=None):
     """
     Main API function for MCTS AI with proper coordinate conversion.
+    The depth-derived iteration count is an upper bound; max_time or the
+    game clock (time_left, increment) can stop the search earlier.
     """
     if not board or not player or depth < 1:
         return None
     
-    iterations = max(25, depth * 15)
-    mcts_move = hybrid_mcts(board, player, iterations=iterations)
+    iterations = max(25, depth * ITERATIONS_PER_DEPTH)
+    if time_manager is None:
+        time_manager = TimeManager.for_move(max_time, time_left, increment,
+                                            check_interval=CLOCK_CHECK_PLIES)
+    mcts_move = hybrid_mcts(board, player, iterations=iterations, time_manager=time_manager,
+                            en_passant_target=en_passant_target,
+                            castling_rights=castling_rights, stats=stats)
     
     if mcts_move is None:
         return None
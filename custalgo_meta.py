@@ -1,80 +1,308 @@
 # custalgo_meta.py
 
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import chess
+
+from analysis_cache import shared_cache
+from bitboard import QUEEN, Position, move_from_dict, move_to_dict
+from chess_bridge import chess_to_position
+from opening_book import home_castling, shared_book
+from search_stats import SearchStats
 import custalgo_n
 import custalgo_killer
 import custalgo_mcts
 import custalgo_negamax
 
 
-def evaluate_board(board, player):
-    """
-    Simple material-based evaluation for your 8x8 board array.
-    Positive score means advantage for 'player'.
-    """
-    piece_values = {'p': 1, 'h': 3, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0}
-    score = 0
-    for row in board:
-        for p in row:
-            if p:
-                color, desc = p.split("(")
-                value = piece_values.get(desc[0].lower(), 0)
-                if color == player:
-                    score += value
-                else:
-                    score -= value
-    return score
-
-
-# Configuration of your AI modules and their selection weights
+# Configuration of your AI modules, their entry points and selection weights.
+# Entry points are called as function(board, player, depth, None, None, None,
+# None, max_time=..., stats=...) in a worker process, so they must be
+# module-level. "cache" (default True) says whether an answer may be reused
+# from the analysis cache; MCTS samples at random, so its answers are not.
 ALGO_CONFIG = [
-    {"module": custalgo_n, "weight": 0.4},
-    {"module": custalgo_killer, "weight": 0.3},
-    {"module": custalgo_mcts, "weight": 0.2},
-    {"module": custalgo_negamax, "weight": 0.1},
+    {"module": custalgo_n, "function": custalgo_n.get_ai_move, "weight": 0.4, "cache": True},
+    {"module": custalgo_killer, "function": custalgo_killer.get_killer_ai_move, "weight": 0.3,
+     "cache": True},
+    {"module": custalgo_mcts, "function": custalgo_mcts.get_mcts_ai_move, "weight": 0.2,
+     "cache": False},
+    {"module": custalgo_negamax, "function": custalgo_negamax.get_negamax_ai_move, "weight": 0.1,
+     "cache": True},
     # Add more algorithms here as you develop them
 ]
 
+# Seconds the whole ensemble may take per move, and the part of it each
+# engine is told to use (the rest covers process hand-off and scoring)
+DEFAULT_MAX_TIME = 2.0
+ENGINE_TIME_SHARE = 0.8
+
+_executor = None
+
+
+def get_executor():
+    """One worker process per configured engine, created on first use and reused."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=len(ALGO_CONFIG))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def run_engine(function, board, player, depth, deadline):
+    """
+    (move, completed depth): the depth of the engine's last finished
+    iteration, less than depth when the clock stopped it early.
+
+    deadline is absolute (time.time()), so an engine that only gets a worker
+    late, behind a search left over from an earlier move, searches for what
+    is left rather than a full budget, and one starting after it gives up.
+    """
+    max_time = deadline - time.time()
+    if max_time <= 0:
+        return None, 0
+    stats = SearchStats()
+    move = function(board, player, depth, None, None, None, None, max_time=max_time, stats=stats)
+    return move, stats.iterations[-1]['depth'] if stats.iterations else 0
+
+
+def engine_name(algo):
+    return algo["module"].__name__
+
 
-def get_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move, return_score=False):
+def collect_proposals(board, player, depth, max_time, parallel=True, cache=None, key=None):
+    """
+    Ask every configured engine for a move within max_time seconds.
+    Returns [(algo, move), ...] for the engines that answered in time.
+    Engines run concurrently in worker processes and stop themselves at a
+    shared deadline; whatever has not answered by then is left out. If the pool cannot
+    be used at all, the engines run one after another in this process.
+
+    With an AnalysisCache and the position's key, an engine that already
+    searched this position to depth answers from the cache, and fresh
+    answers are stored with the depth the engine actually completed.
+    """
+    engine_time = max_time * ENGINE_TIME_SHARE
+    proposals = []
+    algos = []
+    for algo in ALGO_CONFIG:
+        cached = None
+        if cache is not None and algo.get("cache", True):
+            cached = cache.search_result(key, engine_name(algo), depth)
+        if cached is not None:
+            proposals.append((algo, move_to_dict(cached)))
+        else:
+            algos.append(algo)
+
+    def remember(algo, result):
+        move, searched = result
+        if cache is not None and algo.get("cache", True) and move and searched:
+            cache.store_search(key, engine_name(algo), searched, move_from_dict(move))
+        proposals.append((algo, move))
+
+    if not algos:
+        return proposals
+    if parallel:
+        try:
+            executor = get_executor()
+            deadline = time.time() + engine_time
+            futures = {
+                executor.submit(run_engine, algo["function"], board, player, depth,
+                                deadline): algo
+                for algo in algos
+            }
+        except Exception as e:
+            print(f"[MetaSelector] Worker pool unavailable ({e}); searching sequentially.")
+            shutdown_executor()
+        else:
+            done, pending = wait(futures, timeout=max_time)
+            stuck = False
+            for future in pending:
+                # cancel() only stops searches that have not started yet
+                stuck |= not future.cancel()
+                print(f"[MetaSelector] {futures[future]['module'].__name__} missed the deadline.")
+            if stuck:
+                # Overran its own deadline: leave it to finish in the old pool
+                shutdown_executor()
+            for future in done:
+                algo = futures[future]
+                try:
+                    remember(algo, future.result())
+                except Exception as e:
+                    print(f"[MetaSelector] Error in {algo['module'].__name__}: {e}")
+            return proposals
+
+    for algo in algos:
+        try:
+            remember(algo, run_engine(algo["function"], board, player, depth,
+                                      time.time() + engine_time))
+        except Exception as e:
+            print(f"[MetaSelector] Error in {algo['module'].__name__}: {e}")
+    return proposals
+
+
+def as_legal_move(move, legal_moves):
+    """Packed form of a proposal if it is legal here; a bare pawn move to the last rank means queening."""
+    packed = move_from_dict(move)
+    if packed not in legal_moves and not packed >> 12:
+        packed |= QUEEN << 12
+    return packed if packed in legal_moves else None
+
+
+# --- Game ply ---
+def placement(pos):
+    """What a board array shows of a position: the pieces and the side to move."""
+    return pos.turn, tuple(pos.bitboards)
+
+
+def find_line(current, target, plies):
+    """Legal moves from current (left unchanged) to the placement target, or None."""
+    if plies == 0:
+        return None
+    for move in current.generate_legal_moves():
+        undo = current.make_move(move)
+        if placement(current) == target:
+            line = [move]
+        else:
+            rest = find_line(current, target, plies - 1)
+            line = [move] + rest if rest is not None else None
+        current.unmake_move(move, undo)
+        if line is not None:
+            return line
+    return None
+
+
+class GameRecord:
+    """
+    Follows one game from the start position across get_ai_move calls, so
+    the plies played are known although board arrays carry no move counter.
+    Each position asked about must be an earlier one of the game (an undo)
+    or follow the last within max_plies legal moves; otherwise the game is
+    lost until it can be picked up from the start position again.
+    """
+
+    def __init__(self, max_plies=2):
+        self.max_plies = max_plies
+        self.start = chess_to_position(chess.Board())
+        self.positions = []  # one per ply played, the start position first
+
+    def ply(self, pos):
+        """Plies played before pos, or None when the game cannot be followed."""
+        target = placement(pos)
+        for index in range(len(self.positions) - 1, -1, -1):
+            if placement(self.positions[index]) == target:
+                del self.positions[index + 1:]
+                return index
+        bases = [self.positions] if self.positions else []
+        bases.append([self.start])
+        for base in bases:
+            current = base[-1].copy()
+            line = [] if placement(current) == target else find_line(current, target,
+                                                                     self.max_plies)
+            if line is not None:
+                positions = list(base)
+                for move in line:
+                    current.make_move(move)
+                    positions.append(current.copy())
+                self.positions = positions
+                return len(positions) - 1
+        self.positions = []
+        return None
+
+
+_game_record = GameRecord()
+
+
+def get_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move, return_score=False,
+                max_time=DEFAULT_MAX_TIME, parallel=True, cache=None, book=None, ply=None,
+                weighted_book=True):
     """
     Meta AI that asks all configured AI algorithms for their move,
     evaluates moves, and picks the best by weighted randomness.
+    The engines search concurrently and share one max_time deadline;
+    parallel=False runs them one after another instead.
+
+    Legal moves, proposal scores and each engine's answer are kept in an
+    analysis_cache.AnalysisCache keyed by position (the shared one by
+    default), so repeated positions and re-requests after an undo skip
+    the work. Proposals are scored on a bitboard Position, so make_move
+    and undo_move are no longer called.
+
+    Before any engine starts, book (an opening_book.OpeningBook, the shared
+    one by default) is asked for a move; weighted_book picks among the book
+    moves by weight rather than always the heaviest. ply is the number of
+    plies played so far. Board arrays carry no move counter, so without it
+    the game is followed from the start position across calls (see
+    GameRecord); when it cannot be, the book is skipped, since its ply
+    limit could not apply.
 
     Returns chosen move as {'from': (row,col), 'to': (row,col)} or (move, score) if return_score=True.
     """
     scored_moves = []
+    if cache is None:
+        cache = shared_cache()
+    pos = Position.from_board(board, player)
+    legal_moves = cache.legal_moves(pos)
+
+    # Known openings need no search
+    if book is None:
+        book = shared_book()
+    if ply is None and len(book):
+        ply = _game_record.ply(pos)
+    if ply is not None and len(book):
+        # Board arrays carry no castling state; unmoved kings and rooks imply it
+        book_pos = pos.copy()
+        book_pos.castling = home_castling(pos)
+        book_pos.key = book_pos.compute_key()
+        book_move = book.choose(book_pos, ply, weighted_book)
+        # Checked against book_pos: is_valid_move gets no castling rights and
+        # would turn down book castling
+        if book_move and book_move in book_pos.generate_legal_moves():
+            move = move_to_dict(book_move)
+            print(f"[MetaSelector] Book move: {move}")
+            if return_score:
+                book_pos.make_move(book_move)
+                return move, cache.static_eval(book_pos, book_pos.turn ^ 1)
+            return move
     
-    for algo in ALGO_CONFIG:
+    for algo, move in collect_proposals(board, player, depth, max_time, parallel, cache, pos.key):
         module = algo["module"]
         weight = algo["weight"]
         try:
-            move = module.get_ai_move(
-                board, player, depth, generate_all_moves,
-                is_valid_move, make_move, undo_move
-            )
             if not move:
                 continue
             
             # Validate the move with your rules (extra safety)
-            if not is_valid_move(board, move['from'], move['to'], player):
+            packed = as_legal_move(move, legal_moves)
+            if packed is None or not is_valid_move(board, move['from'], move['to'], player):
                 continue
             
-            # Apply move temporarily to evaluate resulting board
-            sr, sc = move['from']
-            er, ec = move['to']
-            captured = board[er][ec]
-            make_move(board, move)
-            score = evaluate_board(board, player)
-            undo_move(board, move, captured)
+            # Score the resulting position; transpositions reuse the cached score
+            undo = pos.make_move(packed)
+            score = cache.static_eval(pos, pos.turn ^ 1)
+            pos.unmake_move(packed, undo)
             
-            scored_moves.append((score, move, weight))
+            scored_moves.append((score, packed, weight))
             print(f"[{module.__name__}] Move: {move}, Score: {score:.2f}, Weight: {weight}")
         
         except Exception as e:
             print(f"[MetaSelector] Error in {module.__name__}: {e}")
     
     if not scored_moves:
+        # Nobody answered in time: a quick shallow search beats no move at all
+        fallback = custalgo_n.get_ai_move(board, player, 1, quiescence_depth=0)
+        if fallback and is_valid_move(board, fallback['from'], fallback['to'], player):
+            print(f"[MetaSelector] No engine answered in time; falling back to {fallback}")
+            if return_score:
+                return fallback, 0
+            return fallback
         print("[MetaSelector] No valid moves from any algorithm.")
         if return_score:
             return None, 0
@@ -86,14 +314,16 @@ def get_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_mo
     top_n = min(3, len(scored_moves))
     top_moves = scored_moves[:top_n]
     
+    # Moves are packed ints here, so picking and matching them is cheap
     moves = [entry[1] for entry in top_moves]
     weights = [entry[2] for entry in top_moves]
     
-    chosen_move = random.choices(moves, weights=weights, k=1)[0]
+    chosen = random.choices(moves, weights=weights, k=1)[0]
+    chosen_move = move_to_dict(chosen)
     
     if return_score:
         for score, move, _ in scored_moves:
-            if move == chosen_move:
+            if move == chosen:
                 return chosen_move, score
         return chosen_move, 0
     else:
@@ -1,65 +1,193 @@
-import heapq
-import itertools
-
-# --- Constants and Piece Values ---
-PIECE_VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 1000}
-
-# --- Move Ordering Heuristic ---
-def move_order_score(move, board, player):
-    from_sq, to_sq = move['from'], move['to']
-    moving_piece = board[from_sq[0]][from_sq[1]]
-    taken_piece = board[to_sq[0]][to_sq[1]]
-    score = 0
-    if taken_piece:
-        score += PIECE_VALUES.get(taken_piece.upper(), 0) * 10 - PIECE_VALUES.get(moving_piece.upper(), 0)
-    if move.get('promotion'):
-        score += 80
-    return score
+from bitboard import NULL_MOVE, Position, PAWN, QUEEN, move_to_dict
+from evaluation import MG_VALUES, evaluate
+from move_ordering import OrderingTables, is_losing_capture, mvv_lva_score, staged_moves
+from parallel_search import split_root
+from search_common import (can_scout, deepen, futility_score, is_futile, null_move_window,
+                           probe_tt, scout_window, selective_candidate, store_tt, try_null_move)
+from search_options import DEFAULT_OPTIONS
+from time_manager import TimeManager
+from transposition import shared_table
+
+# --- Constants ---
+MATE_SCORE = 100000
+TT_NAME = 'custalgo_n'
+INFINITY = float('inf')
+
+# Quiescence: how many capture plies to follow past the horizon, and how much
+# positional slack a capture gets before delta pruning drops it
+MAX_QUIESCENCE_DEPTH = 6
+DELTA_MARGIN = 200
 
 # --- Board Evaluation ---
-def evaluate_board(board, player):
-    score = 0
-    for row in board:
-        for piece in row:
-            if piece:
-                value = PIECE_VALUES.get(piece.upper(), 0)
-                # Use .startswith() to compare player color correctly
-                if piece.startswith(player):
-                    score += value
-                else:
-                    score -= value
-    return score
+def evaluate_board(pos, color):
+    """Shared tapered evaluation (centipawns) from color's point of view."""
+    return evaluate(pos, color)
+
+# --- Quiescence Search ---
+def quiescence(pos, alpha, beta, maximizing_player, player, qdepth=MAX_QUIESCENCE_DEPTH,
+               time_manager=None, stats=None):
+    """
+    Resolve captures and promotions past the horizon so the static score is
+    only taken in quiet positions. Uses the same min/max convention as
+    alpha_beta_with_heap.
+    """
+    if time_manager is not None:
+        time_manager.tick()
+    if stats is not None:
+        stats.qnodes += 1
+    in_check = pos.in_check()
+    if in_check:
+        # No standing pat in check: every evasion has to be looked at
+        moves = pos.generate_legal_moves()
+        if not moves:
+            return -MATE_SCORE if maximizing_player else MATE_SCORE
+        if qdepth <= 0:
+            # Out of plies: checks answered by checks could go on for ever
+            return evaluate_board(pos, player)
+        stand_pat = None
+    else:
+        stand_pat = evaluate_board(pos, player)
+        if qdepth <= 0:
+            return stand_pat
+        if maximizing_player:
+            if stand_pat >= beta:
+                return beta
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return alpha
+            beta = min(beta, stand_pat)
+        moves = pos.generate_legal_moves(captures_only=True)
+
+    mailbox = pos.mailbox
+    scored = []
+    for move in moves:
+        taken = mailbox[(move >> 6) & 63]
+        if stand_pat is not None:
+            # Delta pruning: skip captures that cannot lift the score back
+            # into the window even with a generous positional margin
+            gain = MG_VALUES[PAWN if taken is None else taken % 6] + DELTA_MARGIN
+            if move >> 12:
+                gain += MG_VALUES[QUEEN] - MG_VALUES[PAWN]
+            if maximizing_player and stand_pat + gain <= alpha:
+                continue
+            if not maximizing_player and stand_pat - gain >= beta:
+                continue
+            # Captures that lose material on the exchange are not worth a node
+            if is_losing_capture(pos, move):
+                continue
+        scored.append((-mvv_lva_score(pos, move), move))
+    scored.sort()
 
-# --- Alpha-Beta Pruning with Heap and tie-break counter ---
-def alpha_beta_with_heap(board, depth, alpha, beta, maximizing_player, player,
-                         generate_all_moves, is_valid_move, make_move, undo_move):
+    for _, move in scored:
+        undo = pos.make_move(move)
+        score = quiescence(pos, alpha, beta, not maximizing_player, player, qdepth - 1,
+                           time_manager, stats)
+        pos.unmake_move(move, undo)
+        if maximizing_player:
+            if score > alpha:
+                alpha = score
+        else:
+            if score < beta:
+                beta = score
+        if beta <= alpha:
+            break
+    return alpha if maximizing_player else beta
+
+# --- Alpha-Beta Pruning with Staged Move Ordering ---
+def alpha_beta_with_heap(pos, depth, alpha, beta, maximizing_player, player, tt=None,
+                         quiescence_depth=MAX_QUIESCENCE_DEPTH, ordering=None, ply=0,
+                         prev_move=0, time_manager=None, options=None, stats=None):
+    """
+    Search pos in place with make/unmake. Scores are always from the root
+    player's (colour index) point of view; tt, if given, is a
+    transposition.TranspositionTable probed and filled at every node. At the
+    horizon a capture-only quiescence search of up to quiescence_depth plies
+    takes over from the static evaluation.
+
+    Moves come from move_ordering.staged_moves rather than a heap of every
+    move: hash move, captures, killers, then quiets by history, each stage
+    generated only if the ones before it did not produce a cutoff. ordering
+    holds the killer/history/counter-move tables for this search and
+    prev_move is the move that led here.
+
+    time_manager, if given, counts every node and raises SearchTimeout once
+    its hard limit passes; pos is then left mid-line and must be discarded.
+
+    options: see search_options.SearchOptions. stats: see
+    search_stats.SearchStats.
+    """
+    in_check = None
+    if options is not None:
+        in_check = pos.in_check()
+        depth += options.extension(ply, depth, in_check)
     if depth <= 0:
-        return evaluate_board(board, player), None
+        return quiescence(pos, alpha, beta, maximizing_player, player, quiescence_depth,
+                          time_manager, stats), None
+    if time_manager is not None:
+        time_manager.tick()
+    if stats is not None:
+        stats.nodes += 1
+
+    sign = 1 if maximizing_player else -1
+    if options is not None:
+        tb_score = options.tablebase_score(pos, ply)
+        if tb_score is not None:
+            return sign * tb_score, None
+    alpha_orig, beta_orig = alpha, beta
+    hash_move, alpha, beta, cutoff = probe_tt(tt, pos, depth, alpha, beta, sign, ply, stats)
+    if cutoff is not None:
+        return cutoff
+
+    futility = None
+    if options is not None:
+        static_score = evaluate_board(pos, player)
+        if try_null_move(options, pos, depth, ply, prev_move, in_check, static_score, alpha, beta,
+                         maximizing_player):
+            undo = pos.make_null_move()
+            null_score, _ = alpha_beta_with_heap(
+                pos, options.null_move_depth(depth),
+                *null_move_window(alpha, beta, maximizing_player),
+                not maximizing_player, player, tt, quiescence_depth, ordering, ply + 1,
+                NULL_MOVE, time_manager, options, stats
+            )
+            pos.unmake_null_move(undo)
+            if maximizing_player and null_score >= beta:
+                return beta, None
+            if not maximizing_player and null_score <= alpha:
+                return alpha, None
+        futility = futility_score(options, depth, in_check, static_score, maximizing_player)
 
     best_move = None
-    move_heap = []
-    counter = itertools.count()  # tie breaker
-
-    all_moves = generate_all_moves(board, player)
-
-    for move in all_moves:
-        if not is_valid_move(board, move, player):
-            continue
-        score = move_order_score(move, board, player)
-        heapq.heappush(move_heap, (-score, next(counter), move))
-
-    while move_heap:
-        _, _, move = heapq.heappop(move_heap)
-        sr, sc = move['from']
-        er, ec = move['to']
-        captured_piece = board[er][ec]  # Save the captured piece
-        make_move(board, move)
+    searched = 0
+
+    for move in staged_moves(pos, hash_move, ordering, ply, prev_move):
+        quiet = selective_candidate(options, pos, move, searched, in_check)
+        undo = pos.make_move(move)
+        reduction = 0
+        if quiet and not pos.in_check():
+            # Futility: a quiet move this far below the window cannot catch up
+            if is_futile(futility, alpha, beta, maximizing_player):
+                pos.unmake_move(move, undo)
+                continue
+            reduction = options.reduction(depth, searched, True)
+        searched += 1
+
+        if reduction and can_scout(alpha, beta, maximizing_player):
+            # Late move: a shallow null-window look first, full depth only if it beats the window
+            new_score, _ = alpha_beta_with_heap(
+                pos, depth - 1 - reduction, *scout_window(alpha, beta, maximizing_player),
+                not maximizing_player, player, tt, quiescence_depth, ordering, ply + 1, move,
+                time_manager, options, stats
+            )
+            if not (new_score > alpha if maximizing_player else new_score < beta):
+                pos.unmake_move(move, undo)
+                continue
         new_score, _ = alpha_beta_with_heap(
-            board, depth - 1, alpha, beta, not maximizing_player,
-            'black' if player == 'white' else 'white',
-            generate_all_moves, is_valid_move, make_move, undo_move
+            pos, depth - 1, alpha, beta, not maximizing_player, player, tt,
+            quiescence_depth, ordering, ply + 1, move, time_manager, options, stats
         )
-        undo_move(board, move, captured_piece)  # Restore the captured piece
+        pos.unmake_move(move, undo)
 
         if maximizing_player:
             if new_score > alpha:
@@ -70,14 +198,93 @@ def alpha_beta_with_heap(board, depth, alpha, beta, maximizing_player, player,
                 beta = new_score
                 best_move = move
         if beta <= alpha:
+            if ordering is not None:
+                ordering.record_cutoff(pos, move, depth, ply, prev_move)
+            if stats is not None:
+                stats.cutoffs += 1
+                stats.first_move_cutoffs += searched == 1
             break  # Prune
 
-    return (alpha if maximizing_player else beta), best_move
+    if not searched:
+        if pos.in_check():
+            # Checkmate; prefer the quickest mate and the slowest loss
+            mate = MATE_SCORE + depth
+            return (-mate if maximizing_player else mate), None
+        return 0, None  # Stalemate
 
-# --- Main AI Entry ---
-def get_ai_move(board, player, depth, generate_all_moves, is_valid_move, make_move, undo_move):
-    _, best_move = alpha_beta_with_heap(
-        board, depth, float('-inf'), float('inf'), True, player,
-        generate_all_moves, is_valid_move, make_move, undo_move
+    value = alpha if maximizing_player else beta
+    store_tt(tt, pos, depth, value, alpha_orig, beta_orig, sign, best_move)
+    return value, best_move
+
+# --- Iterative Deepening ---
+def iterative_deepening(pos, depth, tt=None, quiescence_depth=MAX_QUIESCENCE_DEPTH,
+                        time_manager=None, options=None, stats=None):
+    """
+    Search depth 1, 2, ... up to depth while the time manager allows a new
+    iteration. An iteration cut off by the hard limit is thrown away and the
+    move from the last completed one is kept. Without time limits only the
+    full-depth search is run. Completed iterations are reported to stats.
+    """
+    if time_manager is None:
+        time_manager = TimeManager()
+    ordering = OrderingTables()
+
+    def search(root, current_depth):
+        return alpha_beta_with_heap(
+            root, current_depth, -INFINITY, INFINITY, True, root.turn, tt, quiescence_depth,
+            ordering, time_manager=time_manager, options=options, stats=stats
+        )
+
+    first_depth = 1 if time_manager.limited else depth
+    return deepen(pos, range(first_depth, depth + 1), search, time_manager, stats, tt)
+
+def score_root_move(pos, move, depth, alpha, tt, ordering, time_manager, player,
+                    quiescence_depth, options):
+    """parallel_search hook: score the root move just made on pos for player."""
+    score, _ = alpha_beta_with_heap(
+        pos, depth - 1, alpha, INFINITY, False, player, tt, quiescence_depth, ordering, 1,
+        move, time_manager, options
     )
-    return best_move
+    return score
+
+# --- Main AI Entry ---
+def get_ai_move(board, player, depth, generate_all_moves=None, is_valid_move=None,
+                make_move=None, undo_move=None, en_passant_target=None, castling_rights=None,
+                tt=None, quiescence_depth=MAX_QUIESCENCE_DEPTH, max_time=None, time_left=None,
+                increment=0.0, time_manager=None, options=None, workers=1, stats=None):
+    """
+    The move callbacks are accepted for compatibility with existing callers;
+    the search itself runs on a bitboard Position built from board. tt
+    defaults to this engine's shared transposition table, which persists
+    across moves.
+    quiescence_depth caps the capture search at the horizon (0 disables it).
+
+    Time control is optional: max_time is a budget for this move, time_left
+    and increment the game clock (seconds), or pass a ready TimeManager.
+    depth stays the upper bound either way.
+
+    options: see search_options.SearchOptions.
+
+    workers > 1 splits the root moves over that many processes (see
+    parallel_search); each worker then uses its own copy of that table.
+
+    stats: see search_stats.SearchStats.
+    """
+    pos = Position.from_board(board, player, en_passant_target, castling_rights)
+    if tt is None:
+        tt = shared_table(TT_NAME)
+    tt.new_search()
+    if time_manager is None:
+        time_manager = TimeManager.for_move(max_time, time_left, increment)
+    if options is None:
+        options = DEFAULT_OPTIONS
+    best_move = options.tablebase_move(pos)
+    if best_move:
+        return move_to_dict(best_move)
+    if workers > 1:
+        best_move = split_root(score_root_move, pos, depth, workers, time_manager,
+                               (pos.turn, quiescence_depth, options), TT_NAME)
+    else:
+        best_move = iterative_deepening(pos, depth, tt, quiescence_depth, time_manager, options,
+                                        stats)
+    return move_to_dict(best_move) if best_move else None
@@ -1,44 +1,123 @@
 # custalgo_negamax.py
-def negamax(board, player, depth, evaluate, generate_moves, is_valid_move, make_move, undo_move):
-    color = 1 if player == 'white' else -1
-
-    def search(b, d, color_sign):
-        if d == 0:
-            return color_sign * evaluate(b, player), None
-        best_score = -float('inf')
-        best_move = None
-        moves = generate_moves(b, player)
-        for move in moves:
-            if not is_valid_move(b, move, player):
-                continue
-            sr, sc = move['from']
-            er, ec = move['to']
-            captured = b[er][ec]
-            make_move(b, move)
-            score, _ = search(b, d - 1, -color_sign)
-            undo_move(b, move, captured)
-            score = -score
-            if score > best_score:
-                best_score = score
-                best_move = move
-        return best_score, best_move
-
-    _, move = search(board, depth, color)
-    return move
-
-def get_negamax_ai_move(board, player, depth, generate_moves, is_valid_move, make_move, undo_move):
-    # Simple evaluation: material only
-    piece_values = {'p': 1, 'h': 3, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0}
-    def evaluate(b, wrt_player):
-        score = 0
-        for row in b:
-            for p in row:
-                if p:
-                    color, desc = p.split("(")
-                    val = piece_values.get(desc[0].lower(), 0)
-                    if color == wrt_player:
-                        score += val
-                    else:
-                        score -= val
-        return score
-    return negamax(board, player, depth, evaluate, generate_moves, is_valid_move, make_move, undo_move)
+from bitboard import Position, move_to_dict
+from evaluation import evaluate
+from move_ordering import OrderingTables, staged_moves
+from parallel_search import split_root
+from search_common import deepen, probe_tt, store_tt
+from time_manager import TimeManager
+from transposition import shared_table
+
+MATE_SCORE = 100000
+TT_NAME = 'negamax'
+INFINITY = float('inf')
+
+def pvs(pos, depth, alpha, beta, evaluate, tt=None, ordering=None, time_manager=None,
+        ply=0, prev_move=0, stats=None):
+    """
+    Principal variation search on pos in place, scores from the side to
+    move's point of view. The first move gets the full (alpha, beta)
+    window; the rest are searched with a null window around alpha and only
+    re-searched with the full window when they beat it.
+
+    tt is a transposition.TranspositionTable, whose side-to-move scores
+    match negamax directly. ordering holds the killer/history/counter-move
+    tables staged_moves orders by. time_manager.tick() runs at every node
+    and may raise SearchTimeout. stats, a search_stats.SearchStats, counts
+    nodes, table probes and cutoffs.
+    Returns (score, best_move).
+    """
+    if time_manager is not None:
+        time_manager.tick()
+    if stats is not None:
+        stats.nodes += 1
+    if depth <= 0:
+        return evaluate(pos, pos.turn), None
+
+    alpha_orig, beta_orig = alpha, beta
+    # Negamax scores are already the side to move's, as the table keeps them
+    hash_move, alpha, beta, cutoff = probe_tt(tt, pos, depth, alpha, beta, 1, ply, stats)
+    if cutoff is not None:
+        return cutoff
+
+    best_score = -INFINITY
+    best_move = None
+    searched = 0
+    for move in staged_moves(pos, hash_move, ordering, ply, prev_move):
+        undo = pos.make_move(move)
+        if searched == 0:
+            score = -pvs(pos, depth - 1, -beta, -alpha, evaluate, tt, ordering,
+                         time_manager, ply + 1, move, stats)[0]
+        else:
+            score = -pvs(pos, depth - 1, -alpha - 1, -alpha, evaluate, tt, ordering,
+                         time_manager, ply + 1, move, stats)[0]
+            if alpha < score < beta:
+                # Beat the null window: the real score is needed
+                score = -pvs(pos, depth - 1, -beta, -alpha, evaluate, tt, ordering,
+                             time_manager, ply + 1, move, stats)[0]
+        pos.unmake_move(move, undo)
+        searched += 1
+
+        if score > best_score:
+            best_score = score
+            best_move = move
+        if score > alpha:
+            alpha = score
+        if alpha >= beta:
+            if ordering is not None:
+                ordering.record_cutoff(pos, move, depth, ply, prev_move)
+            if stats is not None:
+                stats.cutoffs += 1
+                stats.first_move_cutoffs += searched == 1
+            break
+
+    if not searched:
+        # Checkmate (sooner is worse) or stalemate
+        return (-(MATE_SCORE + depth) if pos.in_check() else 0), None
+
+    store_tt(tt, pos, depth, best_score, alpha_orig, beta_orig, 1, best_move)
+    return best_score, best_move
+
+def iterative_negamax(pos, depth, evaluate, tt=None, time_manager=None, stats=None):
+    """
+    Deepen one ply at a time so each iteration is ordered by the hash moves
+    and killers of the one before, keeping the move of the last completed
+    iteration once the time manager stops the search. Completed iterations
+    are reported to stats.
+    """
+    if time_manager is None:
+        time_manager = TimeManager()
+    ordering = OrderingTables()
+
+    def search(root, current_depth):
+        return pvs(root, current_depth, -INFINITY, INFINITY, evaluate, tt, ordering,
+                   time_manager, stats=stats)
+
+    return deepen(pos, range(1, depth + 1), search, time_manager, stats, tt)
+
+def score_root_move(pos, move, depth, alpha, tt, ordering, time_manager, evaluate):
+    """parallel_search hook: score the root move just made on pos for the root player."""
+    score, _ = pvs(pos, depth - 1, -INFINITY, -alpha, evaluate, tt, ordering, time_manager,
+                   1, move)
+    return -score
+
+def get_negamax_ai_move(board, player, depth, generate_moves=None, is_valid_move=None,
+                        make_move=None, undo_move=None, en_passant_target=None, castling_rights=None,
+                        tt=None, max_time=None, time_left=None, increment=0.0, time_manager=None,
+                        workers=1, stats=None):
+    """
+    Time control as in custalgo_n.get_ai_move; workers > 1 splits the root
+    moves over that many processes, each with its own transposition table.
+    stats: see search_stats.SearchStats.
+    """
+    pos = Position.from_board(board, player, en_passant_target, castling_rights)
+    if tt is None:
+        tt = shared_table(TT_NAME)
+    tt.new_search()
+    if time_manager is None:
+        time_manager = TimeManager.for_move(max_time, time_left, increment)
+    if workers > 1:
+        move = split_root(score_root_move, pos, depth, workers, time_manager, (evaluate,),
+                          TT_NAME)
+    else:
+        move = iterative_negamax(pos, depth, evaluate, tt, time_manager, stats)
+    return move_to_dict(move) if move else None
@@ -0,0 +1,153 @@
+# move_ordering.py – Staged move picker with killer and history tables
+
+from bitboard import PAWN
+
+# MVV-LVA values indexed by piece type: pawn, knight, bishop, rook, queen, king
+PIECE_VALUES = (1, 3, 3, 5, 9, 1000)
+PROMOTION_BONUS = 80
+MAX_PLY = 128
+
+
+def mvv_lva_score(pos, move):
+    """Most valuable victim first, least valuable attacker as tie-break."""
+    mailbox = pos.mailbox
+    moving_piece = mailbox[move & 63]
+    taken_piece = mailbox[(move >> 6) & 63]
+    score = 0
+    if taken_piece is not None:
+        score += PIECE_VALUES[taken_piece % 6] * 10 - PIECE_VALUES[moving_piece % 6]
+    elif moving_piece % 6 == PAWN and (move & 7) != ((move >> 6) & 7):
+        score += PIECE_VALUES[PAWN] * 10 - PIECE_VALUES[PAWN]  # en passant
+    if move >> 12:
+        score += PROMOTION_BONUS
+    return score
+
+
+class OrderingTables:
+    """
+    Per-search move ordering memory: two killer slots per ply, a butterfly
+    history table indexed by side, from and to square, a counter-move table
+    indexed by the previous move's from and to square, and a triangular
+    principal variation table whose root line is kept between iterations.
+    """
+
+    __slots__ = ('killers', 'history', 'counter_moves', 'pv', 'previous_pv')
+
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 64 * 64)
+        self.counter_moves = [0] * (2 * 64 * 64)
+        self.pv = [[] for _ in range(MAX_PLY + 1)]
+        self.previous_pv = {}  # position key -> PV move from the last iteration
+
+    def store_killer(self, ply, move):
+        slots = self.killers[ply]
+        if slots[0] != move:
+            slots[1] = slots[0]
+            slots[0] = move
+
+    def add_history(self, color, move, depth):
+        index = (color << 12) | (move & 4095)
+        self.history[index] += depth * depth
+
+    def counter_move(self, color, prev_move):
+        return self.counter_moves[(color << 12) | (prev_move & 4095)] if prev_move else 0
+
+    def record_cutoff(self, pos, move, depth, ply, prev_move=0):
+        """A quiet move refuted this node: remember it for siblings and later searches."""
+        if not pos.is_tactical(move):
+            self.store_killer(ply, move)
+            self.add_history(pos.turn, move, depth)
+            if prev_move:
+                self.counter_moves[(pos.turn << 12) | (prev_move & 4095)] = move
+
+    # --- Principal variation ---
+    def clear_pv(self, ply):
+        self.pv[ply] = []
+
+    def update_pv(self, ply, move):
+        """move became the best at ply: its line is move plus the child's line."""
+        self.pv[ply] = [move] + self.pv[ply + 1]
+
+    def principal_variation(self):
+        return list(self.pv[0])
+
+    def remember_pv(self, pos):
+        """
+        Keep the root line of the finished iteration, keyed by the position
+        each move is played from, so the next iteration tries it first.
+        """
+        self.previous_pv = {}
+        undos = []
+        for move in self.pv[0]:
+            if not pos.is_legal(move):
+                break
+            self.previous_pv[pos.key] = move
+            undos.append((move, pos.make_move(move)))
+        for move, undo in reversed(undos):
+            pos.unmake_move(move, undo)
+
+    def pv_move(self, pos):
+        return self.previous_pv.get(pos.key, 0)
+
+
+def is_losing_capture(pos, move):
+    """SEE below zero; captures of an equal or bigger piece are never losing."""
+    mailbox = pos.mailbox
+    taken = mailbox[(move >> 6) & 63]
+    if taken is not None and PIECE_VALUES[taken % 6] >= PIECE_VALUES[mailbox[move & 63] % 6]:
+        return False
+    return pos.see(move) < 0
+
+
+def staged_moves(pos, hash_move=0, tables=None, ply=0, prev_move=0):
+    """
+    Yield legal moves lazily in stages: the hash move, winning and even
+    captures and promotions by MVV-LVA, the killers for this ply, quiet
+    moves by history, and finally the captures that static exchange
+    evaluation says lose material. A stage is only generated once the
+    previous one is exhausted, so a cutoff on an early move skips the rest
+    of the work. The counter-move to prev_move joins the killer stage.
+
+    The caller may make/unmake each yielded move before asking for the next.
+    """
+    if hash_move and pos.is_legal(hash_move):
+        yield hash_move
+    else:
+        hash_move = 0
+
+    captures = pos.generate_legal_moves(captures_only=True)
+    losing = []
+    if captures:
+        captures.sort(key=lambda m: mvv_lva_score(pos, m), reverse=True)
+        for move in captures:
+            if move == hash_move:
+                continue
+            if is_losing_capture(pos, move):
+                losing.append(move)
+            else:
+                yield move
+
+    killers = ()
+    if tables is not None:
+        candidates = tables.killers[ply] + [tables.counter_move(pos.turn, prev_move)]
+        killers = []
+        for k in candidates:
+            if k and k != hash_move and k not in killers \
+                    and pos.is_legal(k) and not pos.is_tactical(k):
+                killers.append(k)
+        for move in killers:
+            yield move
+
+    quiets = pos.generate_legal_moves(quiets_only=True)
+    if tables is not None and len(quiets) > 1:
+        color = pos.turn
+        history = tables.history
+        base = color << 12
+        quiets.sort(key=lambda m: history[base | (m & 4095)], reverse=True)
+    for move in quiets:
+        if move != hash_move and move not in killers:
+            yield move
+
+    for move in losing:
+        yield move
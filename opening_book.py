@@ -0,0 +1,198 @@
+# opening_book.py – Polyglot opening book lookup on a memory-mapped .bin file
+#
+# A Polyglot book is a sorted array of 16-byte big-endian entries
+# (key, move, weight, learn). The file is mapped rather than read, and the
+# entries for a position are found by binary search on the key, so a probe
+# touches a handful of pages and costs microseconds.
+
+import mmap
+import random
+import struct
+
+from chess.polyglot import POLYGLOT_RANDOM_ARRAY
+
+from bitboard import BLACK, CASTLING_MOVES, KING, PAWN, ROOK, WHITE, encode_move, iter_bits
+
+# Optional: Set to your Polyglot .bin book or None if unavailable
+BOOK_PATH = None
+# Plies from the start of the game after which the book is no longer consulted
+DEFAULT_MAX_PLY = 20
+
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+
+# Offsets into POLYGLOT_RANDOM_ARRAY
+CASTLING_OFFSET = 768
+EN_PASSANT_OFFSET = 772
+TURN_OFFSET = 780
+# Castling right bit -> Polyglot castling index, in the order WK, WQ, BK, BQ
+CASTLING_INDEX = ((1, 0), (2, 1), (4, 2), (8, 3))
+
+
+# --- Keys and moves ---
+def polyglot_key(pos):
+    """The Polyglot Zobrist key of a bitboard Position."""
+    key = 0
+    for code, bb in enumerate(pos.bitboards):
+        color, ptype = divmod(code, 6)
+        # Polyglot orders pieces black pawn, white pawn, black knight, ...
+        kind = 2 * ptype + (color == WHITE)
+        for sq in iter_bits(bb):
+            # Rows count down from rank 8 here, Polyglot ranks count up from rank 1
+            key ^= POLYGLOT_RANDOM_ARRAY[64 * kind + 8 * (7 - (sq >> 3)) + (sq & 7)]
+    for bit, index in CASTLING_INDEX:
+        if pos.castling & bit:
+            key ^= POLYGLOT_RANDOM_ARRAY[CASTLING_OFFSET + index]
+    if pos.en_passant is not None and _en_passant_capturable(pos):
+        key ^= POLYGLOT_RANDOM_ARRAY[EN_PASSANT_OFFSET + (pos.en_passant & 7)]
+    if pos.turn == WHITE:
+        key ^= POLYGLOT_RANDOM_ARRAY[TURN_OFFSET]
+    return key
+
+
+def _en_passant_capturable(pos):
+    """Polyglot only hashes the en passant file when a pawn could take there."""
+    target = pos.en_passant
+    origin = target + 8 if pos.turn == WHITE else target - 8
+    pawns = pos.bitboards[pos.turn * 6 + PAWN]
+    col = target & 7
+    return bool((col > 0 and pawns >> (origin - 1) & 1) or (col < 7 and pawns >> (origin + 1) & 1))
+
+
+def decode_book_move(raw, pos):
+    """
+    Polyglot move bits -> packed move. Castling is stored as the king
+    taking its own rook; it becomes the king's two-square move.
+    """
+    to_sq = (7 - (raw >> 3 & 7)) * 8 + (raw & 7)
+    from_sq = (7 - (raw >> 9 & 7)) * 8 + (raw >> 6 & 7)
+    promotion = raw >> 12 & 7  # 1 knight ... 4 queen, as the bitboard piece types
+    code = pos.mailbox[from_sq]
+    if code is not None and code % 6 == KING and pos.mailbox[to_sq] == code - KING + ROOK:
+        for castle in CASTLING_MOVES[code // 6]:
+            if castle[1] == from_sq and castle[3] == to_sq:
+                to_sq = castle[2]
+    return encode_move(from_sq, to_sq, promotion)
+
+
+def home_castling(pos):
+    """Castling rights implied by kings and rooks still on their home squares."""
+    rights = 0
+    for color in (WHITE, BLACK):
+        king = pos.bitboards[color * 6 + KING]
+        rooks = pos.bitboards[color * 6 + ROOK]
+        for bit, king_from, _, rook_from, _, _ in CASTLING_MOVES[color]:
+            if king >> king_from & 1 and rooks >> rook_from & 1:
+                rights |= bit
+    return rights
+
+
+# --- Book ---
+class OpeningBook:
+    """
+    A Polyglot book mapped from path. Without a path (or with an unreadable
+    file) the book is empty and never answers, so callers need no checks.
+    Positions more than max_ply plies into the game are not looked up.
+    """
+
+    def __init__(self, path=None, max_ply=DEFAULT_MAX_PLY):
+        self.max_ply = max_ply
+        self.path = None
+        self._file = None
+        self._map = None
+        self.size = 0
+        if path:
+            self.open(path)
+
+    def __len__(self):
+        return self.size
+
+    def open(self, path):
+        self.close()
+        try:
+            self._file = open(path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, unreadable or empty (an empty file cannot be mapped)
+            self.close()
+            return
+        self.path = path
+        self.size = len(self._map) // ENTRY.size
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self.path = None
+        self._file = None
+        self._map = None
+        self.size = 0
+
+    def _first_index(self, key):
+        """Index of the first entry with this key or a larger one."""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(self._map, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, pos):
+        """[(packed move, weight), ...] for pos, legal moves only, in file order."""
+        if not self.size:
+            return []
+        key = polyglot_key(pos)
+        found = []
+        index = self._first_index(key)
+        while index < self.size:
+            entry_key, raw, weight, _ = ENTRY.unpack_from(self._map, index * ENTRY.size)
+            if entry_key != key:
+                break
+            move = decode_book_move(raw, pos)
+            if pos.is_legal(move):
+                found.append((move, weight))
+            index += 1
+        return found
+
+    def choose(self, pos, ply=None, weighted=True, rng=random):
+        """
+        A book move for pos, or None. weighted picks at random in
+        proportion to the entry weights; otherwise the heaviest entry is
+        played. ply defaults to the ply implied by pos's move counter.
+        """
+        if ply is None:
+            ply = 2 * (pos.fullmove_number - 1) + (pos.turn == BLACK)
+        if ply > self.max_ply:
+            return None
+        found = self.entries(pos)
+        if weighted:
+            playable = [entry for entry in found if entry[1] > 0]
+            if playable:
+                return rng.choices([m for m, _ in playable], weights=[w for _, w in playable])[0]
+        if not found:
+            return None
+        return max(found, key=lambda entry: entry[1])[0]
+
+
+# --- Shared book ---
+_shared_book = None
+
+
+def shared_book():
+    """The process-wide book, opened on BOOK_PATH on first use."""
+    global _shared_book
+    if _shared_book is None:
+        _shared_book = OpeningBook(BOOK_PATH)
+    return _shared_book
+
+
+def configure(path, max_ply=DEFAULT_MAX_PLY):
+    """Point the shared book at a Polyglot file."""
+    global _shared_book
+    if _shared_book is not None:
+        _shared_book.close()
+    _shared_book = OpeningBook(path, max_ply)
+    return _shared_book
@@ -0,0 +1,120 @@
+# parallel_search.py – Root-split parallel search over a process pool
+#
+# The engines are pure Python, so threads would share one core through the
+# GIL. Instead the root moves are dealt out to worker processes; each worker
+# runs iterative deepening over its share with the engine's process-wide
+# transposition table (kept between moves because the pool is reused), and
+# the parent picks the best move at the deepest depth every worker finished.
+
+from concurrent.futures import ProcessPoolExecutor
+
+from move_ordering import OrderingTables, staged_moves
+from time_manager import SearchTimeout, TimeManager
+from transposition import shared_table
+
+INFINITY = float('inf')
+
+# --- Worker pool ---
+_pool = None
+_pool_workers = 0
+
+
+def get_pool(workers):
+    """The process pool for this many workers, created on first use and then reused."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_workers = 0
+
+
+# --- Worker side ---
+def search_root_moves(score_move, pos, moves, depth, soft_limit, hard_limit, args,
+                      tt_name=None):
+    """
+    Iterative deepening over a subset of the root moves. score_move(pos,
+    move, depth, alpha, tt, tables, time_manager, *args) is an engine's
+    module-level function that scores the position after move (already
+    made on pos) from the root player's side, searching depth - 1 plies
+    below it with alpha as the bound to beat; tables is the worker's
+    OrderingTables and tt the worker's shared table named tt_name (see
+    transposition.shared_table), or None without a name.
+
+    Returns [(score, move), ...], one entry per completed depth.
+    """
+    tt = None
+    if tt_name is not None:
+        tt = shared_table(tt_name)
+        tt.new_search()
+    time_manager = TimeManager(soft_limit, hard_limit)
+    tables = OrderingTables()
+    results = []
+    for current_depth in range(1, depth + 1):
+        if results and not time_manager.can_start_iteration():
+            break
+        root = pos.copy()
+        alpha = -INFINITY
+        best_move = None
+        try:
+            for move in moves:
+                undo = root.make_move(move)
+                score = score_move(root, move, current_depth, alpha, tt, tables,
+                                   time_manager, *args)
+                root.unmake_move(move, undo)
+                if best_move is None or score > alpha:
+                    alpha = score
+                    best_move = move
+        except SearchTimeout:
+            break
+        results.append((alpha, best_move))
+        # The best move so far leads the next iteration, as in a serial search
+        moves = [best_move] + [m for m in moves if m != best_move]
+    return results
+
+
+# --- Parent side ---
+def split_root(score_move, pos, depth, workers, time_manager=None, args=(), tt_name=None):
+    """
+    Deal pos's legal moves out round-robin in staged order, so every
+    worker gets some of the promising ones, and search the shares in
+    parallel. args are passed on to score_move after its own arguments
+    and must be picklable; tt_name picks the workers' shared tables.
+    Returns the best move at the deepest depth all workers completed, or
+    None when there are no legal moves.
+    """
+    moves = list(staged_moves(pos))
+    if len(moves) <= 1:
+        return moves[0] if moves else None
+    workers = max(1, min(workers, len(moves)))
+    soft_limit = hard_limit = None
+    if time_manager is not None:
+        # Workers start their own clocks, so hand them what is left
+        elapsed = time_manager.elapsed()
+        if time_manager.soft_limit is not None:
+            soft_limit = max(0.0, time_manager.soft_limit - elapsed)
+        if time_manager.hard_limit is not None:
+            hard_limit = max(0.0, time_manager.hard_limit - elapsed)
+
+    pool = get_pool(workers)
+    futures = [
+        pool.submit(search_root_moves, score_move, pos, moves[i::workers], depth,
+                    soft_limit, hard_limit, args, tt_name)
+        for i in range(workers)
+    ]
+    results = [future.result() for future in futures]
+
+    finished = [r for r in results if r]
+    if not finished:
+        return moves[0]
+    common_depth = min(len(r) for r in finished)
+    score, best_move = max((r[common_depth - 1] for r in finished), key=lambda entry: entry[0])
+    return best_move
@@ -0,0 +1,291 @@
+# perft.py – Move generation node counts, divide output and a correctness suite
+#
+# perft(n) counts the leaf nodes of the full legal move tree n plies deep.
+# Checked against published counts for standard positions, it exercises
+# castling, en passant, promotions and pins; timed, it is the speed baseline
+# for move generation. Run "python perft.py --help" for the command line.
+
+import argparse
+import os
+import time
+
+import chess
+
+import rules
+from bitboard import Position
+from chess_bridge import chess_to_position, move_to_chess, position_to_chess
+
+SUITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perft_positions.epd')
+DEFAULT_SUITE_DEPTH = 3
+
+
+# --- Backends ---
+# A backend holds one position and moves through the tree in place:
+# moves(), push(move) -> undo, pop(move, undo), uci(move) and fen().
+class BitboardBackend:
+    """bitboard.Position with its own legal move generator and make/unmake."""
+
+    name = 'bitboard'
+    underpromotions = True
+
+    def __init__(self, fen):
+        self.pos = chess_to_position(chess.Board(fen))
+
+    def moves(self):
+        return self.pos.generate_legal_moves()
+
+    def push(self, move):
+        return self.pos.make_move(move)
+
+    def pop(self, move, undo):
+        self.pos.unmake_move(move, undo)
+
+    def uci(self, move):
+        return move_to_chess(move).uci()
+
+    def fen(self):
+        return position_to_chess(self.pos).fen()
+
+
+class RulesBackend:
+    """
+    The nested-list board driven through rules.py: get_all_player_moves,
+    make_move and unmake_move, with the en passant target and castling
+    rights kept the way a game loop keeps them. rules.py always promotes
+    to a queen, so its counts are checked against queen-only references.
+    """
+
+    name = 'rules'
+    underpromotions = False
+
+    def __init__(self, fen):
+        board = chess.Board(fen)
+        pos = chess_to_position(board)
+        self.board = pos.to_board()
+        self.turn = 'white' if board.turn == chess.WHITE else 'black'
+        self.en_passant_target = pos.en_passant_target()
+        self.castling_rights = pos.castling_rights()
+
+    def moves(self):
+        return rules.get_all_player_moves(self.board, self.turn, self.en_passant_target,
+                                          self.castling_rights)
+
+    def push(self, move):
+        (sr, sc), (er, ec) = move['from'], move['to']
+        pawn = self.board[sr][sc].endswith('(p)')
+        undo = rules.make_move(self.board, move['from'], move['to'], self.turn,
+                               self.en_passant_target, self.castling_rights)
+        previous_target = self.en_passant_target
+        self.en_passant_target = ((sr + er) // 2, sc) if pawn and abs(er - sr) == 2 else None
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        return undo, previous_target
+
+    def pop(self, move, undo):
+        move_undo, self.en_passant_target = undo
+        rules.unmake_move(self.board, move_undo, self.castling_rights)
+        self.turn = 'black' if self.turn == 'white' else 'white'
+
+    def uci(self, move):
+        (sr, sc), (er, ec) = move['from'], move['to']
+        name = '%s%d%s%d' % ('abcdefgh'[sc], 8 - sr, 'abcdefgh'[ec], 8 - er)
+        if self.board[sr][sc].endswith('(p)') and er in (0, 7):
+            name += 'q'
+        return name
+
+    def fen(self):
+        pos = Position.from_board(self.board, self.turn, self.en_passant_target,
+                                  self.castling_rights)
+        return position_to_chess(pos).fen()
+
+
+class ReferenceBackend:
+    """python-chess, the independent reference for locating mismatches."""
+
+    name = 'python-chess'
+
+    def __init__(self, fen, underpromotions=True):
+        self.board = chess.Board(fen)
+        self.underpromotions = underpromotions
+
+    def moves(self):
+        if self.underpromotions:
+            return list(self.board.legal_moves)
+        return [m for m in self.board.legal_moves if m.promotion in (None, chess.QUEEN)]
+
+    def push(self, move):
+        self.board.push(move)
+
+    def pop(self, move, undo):
+        self.board.pop()
+
+    def uci(self, move):
+        return move.uci()
+
+    def fen(self):
+        return self.board.fen()
+
+
+BACKENDS = {backend.name: backend for backend in (BitboardBackend, RulesBackend)}
+
+
+# --- Counting ---
+def perft(backend, depth):
+    """Leaf nodes depth plies below the backend's position (bulk-counted at the last ply)."""
+    if depth == 0:
+        return 1
+    moves = backend.moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = backend.push(move)
+        nodes += perft(backend, depth - 1)
+        backend.pop(move, undo)
+    return nodes
+
+
+def divide(backend, depth):
+    """{uci: perft(depth - 1) after that move} for every root move."""
+    counts = {}
+    for move in backend.moves():
+        # Named before the push: the rules backend reads the moving piece off the board
+        name = backend.uci(move)
+        undo = backend.push(move)
+        counts[name] = perft(backend, depth - 1)
+        backend.pop(move, undo)
+    return counts
+
+
+def find_mismatch(backend, reference, depth):
+    """
+    Walk down the first subtree where backend and reference disagree and
+    return (fen, moves missing from backend, moves it has in excess, line),
+    or None when the counts agree.
+    """
+    line = []
+    while depth > 0:
+        ours = {backend.uci(m): m for m in backend.moves()}
+        theirs = {reference.uci(m): m for m in reference.moves()}
+        if ours.keys() != theirs.keys() or depth == 1:
+            if ours.keys() == theirs.keys():
+                return None
+            return (backend.fen(), sorted(theirs.keys() - ours.keys()),
+                    sorted(ours.keys() - theirs.keys()), line)
+        for name in sorted(ours):
+            undo = backend.push(ours[name])
+            ref_undo = reference.push(theirs[name])
+            if perft(backend, depth - 1) != perft(reference, depth - 1):
+                line.append(name)
+                break
+            backend.pop(ours[name], undo)
+            reference.pop(theirs[name], ref_undo)
+        else:
+            return None
+        depth -= 1
+    return None
+
+
+# --- Suite ---
+def load_suite(path=SUITE_PATH):
+    """
+    [(fen, {depth: nodes}, {depth: queen-only nodes}), ...] from an EPD file
+    with ";D<n> <nodes>" operations, and ";Q<n> <nodes>" where counting only
+    queen promotions gives a different total.
+    """
+    suite = []
+    with open(path, encoding='utf-8') as fp:
+        for line in fp:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fen, *ops = [part.strip() for part in line.split(';')]
+            counts, queen_counts = {}, {}
+            for op in ops:
+                key, value = op.split()
+                target = counts if key[0] == 'D' else queen_counts
+                target[int(key[1:])] = int(value)
+            suite.append((fen, counts, queen_counts))
+    return suite
+
+
+def expected_nodes(counts, queen_counts, depth, underpromotions):
+    if not underpromotions and depth in queen_counts:
+        return queen_counts[depth]
+    return counts.get(depth)
+
+
+def run_suite(backend_class, max_depth=DEFAULT_SUITE_DEPTH, path=SUITE_PATH, report=print):
+    """
+    perft every suite position at each listed depth up to max_depth,
+    reporting nodes, time and nodes per second, and where a count is wrong
+    the subtree python-chess disagrees on. Returns the number of failures;
+    a suite with nothing to run at max_depth counts as one.
+    """
+    failures = 0
+    runs = 0
+    total_nodes = total_time = 0
+    for fen, counts, queen_counts in load_suite(path):
+        for depth in sorted(d for d in counts if d <= max_depth):
+            runs += 1
+            expected = expected_nodes(counts, queen_counts, depth, backend_class.underpromotions)
+            backend = backend_class(fen)
+            start = time.perf_counter()
+            nodes = perft(backend, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = 'ok' if nodes == expected else 'FAIL (expected %d)' % expected
+            report('%-10s d%d %10d nodes %8.3fs %9d nps  %s  %s' % (
+                backend_class.name, depth, nodes, elapsed,
+                nodes / elapsed if elapsed else 0, status, fen))
+            if nodes != expected:
+                failures += 1
+                mismatch = find_mismatch(backend_class(fen),
+                                         ReferenceBackend(fen, backend_class.underpromotions),
+                                         depth)
+                if mismatch:
+                    bad_fen, missing, extra, line = mismatch
+                    report('    after %s: %s' % (' '.join(line) or '(root)', bad_fen))
+                    report('    missing %s, extra %s' % (missing, extra))
+    if not runs:
+        report('%s: no suite positions to run up to depth %d in %s' % (
+            backend_class.name, max_depth, path))
+        failures += 1
+    report('%s: %d nodes in %.2fs, %d nps, %d failure(s)' % (
+        backend_class.name, total_nodes, total_time,
+        total_nodes / total_time if total_time else 0, failures))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='perft node counts for the move generators')
+    parser.add_argument('--backend', choices=sorted(BACKENDS) + ['all'], default='all')
+    parser.add_argument('--depth', type=int, default=DEFAULT_SUITE_DEPTH,
+                        help='deepest suite depth to run, or the depth for --fen')
+    parser.add_argument('--fen', help='count this position instead of running the suite')
+    parser.add_argument('--divide', action='store_true', help='with --fen, list counts per root move')
+    parser.add_argument('--suite', default=SUITE_PATH, help='EPD file with ;D<n> counts')
+    args = parser.parse_args(argv)
+
+    backends = list(BACKENDS.values()) if args.backend == 'all' else [BACKENDS[args.backend]]
+    if args.fen:
+        for backend_class in backends:
+            backend = backend_class(args.fen)
+            start = time.perf_counter()
+            if args.divide:
+                counts = divide(backend, args.depth)
+                for name in sorted(counts):
+                    print('%s: %d' % (name, counts[name]))
+                nodes = sum(counts.values())
+            else:
+                nodes = perft(backend, args.depth)
+            elapsed = time.perf_counter() - start
+            print('%s: %d nodes in %.3fs, %d nps' % (
+                backend_class.name, nodes, elapsed, nodes / elapsed if elapsed else 0))
+        return 0
+    failures = sum(run_suite(backend_class, args.depth, args.suite) for backend_class in backends)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,4 +1,11 @@
-from custalgo_n import get_ai_move
+from collections import namedtuple
+
+from bitboard import Position, QUEEN, square, row_col, move_from, move_to, move_promotion, encode_move
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+STRAIGHT_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
 
 def is_valid_move(board, start, end, turn, en_passant_target=None, castling_rights=None):
     sr, sc = start
@@ -103,46 +110,102 @@ def is_clear_path(board, start, end):
     return True
 
 def is_square_under_attack(board, pos, by_color):
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece.startswith(by_color):
-                if is_valid_move(board, (r, c), pos, by_color):
-                    return True
+    # Work outward from the target square instead of asking every enemy
+    # piece whether it can reach it.
+    r, c = pos
+
+    # Pawns attack from the row behind them, which is below for white
+    pawn = f"{by_color}(p)"
+    pr = r + 1 if by_color == 'white' else r - 1
+    if 0 <= pr < 8:
+        if c > 0 and board[pr][c-1] == pawn:
+            return True
+        if c < 7 and board[pr][c+1] == pawn:
+            return True
+
+    knight = f"{by_color}(h)"
+    king = f"{by_color}(k)"
+    for offsets, attacker in ((KNIGHT_OFFSETS, knight), (KING_OFFSETS, king)):
+        for dr, dc in offsets:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < 8 and 0 <= nc < 8 and board[nr][nc] == attacker:
+                return True
+
+    # Sliding pieces: walk each ray and stop at the first blocker
+    queen = f"{by_color}(q)"
+    for directions, slider in ((STRAIGHT_DIRECTIONS, f"{by_color}(r)"),
+                               (DIAGONAL_DIRECTIONS, f"{by_color}(b)")):
+        for dr, dc in directions:
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < 8 and 0 <= nc < 8:
+                piece = board[nr][nc]
+                if piece:
+                    if piece == slider or piece == queen:
+                        return True
+                    break
+                nr += dr
+                nc += dc
     return False
 
+def static_exchange_score(board, start, end, turn, en_passant_target=None):
+    """
+    Centipawns the side to move nets from the capture start -> end once the
+    whole exchange on that square is played out (negative: losing capture).
+    """
+    position = Position.from_board(board, turn, en_passant_target)
+    return position.see(encode_move(square(*start), square(*end)))
+
 def get_all_valid_moves(board, pos, turn, en_passant_target=None, castling_rights=None):
+    position = Position.from_board(board, turn, en_passant_target, castling_rights)
     moves = []
-    for r in range(8):
-        for c in range(8):
-            if is_valid_move(board, pos, (r, c), turn, en_passant_target, castling_rights):
-                # Check if move would leave king in check
-                temp_board = [row[:] for row in board]
-                make_move(temp_board, pos, (r, c), turn, en_passant_target, castling_rights)
-                if not is_king_in_check(temp_board, turn):
-                    moves.append((r, c))
+    for move in position.generate_legal_moves(from_mask=1 << square(*pos)):
+        # Promotions always make a queen here, so the other choices collapse
+        if move_promotion(move) in (0, QUEEN):
+            moves.append(row_col(move_to(move)))
     return moves
 
 def get_all_player_moves(board, player, en_passant_target=None, castling_rights=None):
+    position = Position.from_board(board, player, en_passant_target, castling_rights)
     moves = []
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece.startswith(player):
-                pos_moves = get_all_valid_moves(board, (r, c), player, en_passant_target, castling_rights)
-                for dest in pos_moves:
-                    moves.append({'from': (r, c), 'to': dest})
+    for move in position.generate_legal_moves():
+        if move_promotion(move) in (0, QUEEN):
+            moves.append({'from': row_col(move_from(move)), 'to': row_col(move_to(move))})
     return moves
 
+# Everything unmake_move needs to take a move back in place
+MoveUndo = namedtuple('MoveUndo', [
+    'start', 'end', 'piece', 'captured', 'captured_pos',
+    'rook_move', 'en_passant_target', 'castling_rights', 'promoted',
+])
+
+CASTLING_SQUARES = {
+    (7, 4): ('white_kingside', 'white_queenside'),
+    (7, 7): ('white_kingside',),
+    (7, 0): ('white_queenside',),
+    (0, 4): ('black_kingside', 'black_queenside'),
+    (0, 7): ('black_kingside',),
+    (0, 0): ('black_queenside',),
+}
+
 def make_move(board, start, end, turn, en_passant_target=None, castling_rights=None):
+    """
+    Play a move in place and return a MoveUndo record for unmake_move.
+    If castling_rights is given it is updated in place for king and rook
+    moves and rook captures; the previous rights are kept in the record.
+    """
     sr, sc = start
     er, ec = end
-    piece = board[sr][sc]
+    piece = moved = board[sr][sc]
     name = piece[piece.index('(')+1]
+    captured = board[er][ec]
+    captured_pos = end if captured else None
+    rook_move = None
     
     # Handle en passant
     if name == 'p' and abs(sc - ec) == 1 and not board[er][ec] and (er, ec) == en_passant_target:
         captured_row = er + 1 if turn == 'white' else er - 1
+        captured = board[captured_row][ec]
+        captured_pos = (captured_row, ec)
         board[captured_row][ec] = None
     
     # Handle castling
@@ -150,32 +213,59 @@ def make_move(board, start, end, turn, en_passant_target=None, castling_rights=N
         if ec > sc:
             board[er][ec-1] = board[er][7]
             board[er][7] = None
+            rook_move = ((er, 7), (er, ec-1))
         else:
             board[er][ec+1] = board[er][0]
             board[er][0] = None
+            rook_move = ((er, 0), (er, ec+1))
     
     # Handle pawn promotion
-    if name == 'p' and er in [0, 7]:
+    promoted = name == 'p' and er in [0, 7]
+    if promoted:
         piece = f"{turn}(q)"
     
     board[er][ec] = piece
     board[sr][sc] = None
 
+    previous_rights = None
+    if castling_rights is not None:
+        previous_rights = dict(castling_rights)
+        for square_pos in (start, end):
+            for key in CASTLING_SQUARES.get(square_pos, ()):
+                castling_rights[key] = False
+
+    return MoveUndo(start, end, moved, captured, captured_pos,
+                    rook_move, en_passant_target, previous_rights, promoted)
+
+def unmake_move(board, undo, castling_rights=None):
+    """
+    Take back a move played with make_move. Returns the en passant target
+    that was in effect before the move; castling_rights, if given, is
+    restored in place.
+    """
+    sr, sc = undo.start
+    er, ec = undo.end
+    board[sr][sc] = undo.piece
+    board[er][ec] = None
+    if undo.captured_pos:
+        cr, cc = undo.captured_pos
+        board[cr][cc] = undo.captured
+    if undo.rook_move:
+        (rr, rc), (tr, tc) = undo.rook_move
+        board[rr][rc] = board[tr][tc]
+        board[tr][tc] = None
+    if castling_rights is not None and undo.castling_rights is not None:
+        castling_rights.update(undo.castling_rights)
+    return undo.en_passant_target
+
 def is_king_in_check(board, color):
-    king_pos = None
+    king = f"{color}(k)"
     for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece.startswith(color) and piece[piece.index('(')+1] == 'k':
-                king_pos = (r, c)
-                break
-        if king_pos:
-            break
-    
-    if not king_pos:
-        return False
-    
-    return is_square_under_attack(board, king_pos, 'black' if color == 'white' else 'white')
+        row = board[r]
+        if king in row:
+            king_pos = (r, row.index(king))
+            return is_square_under_attack(board, king_pos, 'black' if color == 'white' else 'white')
+    return False
 
 def update_castling_rights(castling_rights, piece, start_pos):
     if piece.endswith('k)'):
@@ -0,0 +1,153 @@
+# search_common.py – Building blocks shared by the alpha-beta engines
+#
+# custalgo_n and custalgo_killer are both minimax searches scored from the
+# root player's side, with the same transposition table handling and the
+# same selective search rules; all three alpha-beta engines share the
+# iterative deepening driver. maximizing_player is True at nodes where the
+# root player moves, and sign (1 or -1) is the matching factor between
+# side-to-move and root-player scores.
+
+from search_stats import pv_strings, tt_pv
+from time_manager import SearchTimeout
+from transposition import EXACT, LOWER, UPPER, to_tt_bound
+
+INFINITY = float('inf')
+
+
+# --- Transposition table ---
+# The table stores side-to-move scores; sign maps them to the root player's
+def probe_tt(tt, pos, depth, alpha, beta, sign, ply, stats=None):
+    """
+    Look pos up in tt. Returns (hash_move, alpha, beta, cutoff): the window
+    narrowed by a stored bound deep enough to trust, and (value, move) in
+    cutoff when the entry alone settles the node, else None.
+    """
+    if tt is None:
+        return 0, alpha, beta, None
+    entry = tt.probe(pos.key)
+    if stats is not None:
+        stats.tt_probes += 1
+        stats.tt_hits += entry is not None
+    if entry is None:
+        return 0, alpha, beta, None
+    # Never cut at the root: there the entry only orders the moves
+    if entry.depth >= depth and ply > 0:
+        value = sign * entry.score
+        bound = to_tt_bound(entry.bound, sign)
+        if bound == EXACT:
+            return entry.move or 0, alpha, beta, (value, entry.move)
+        if bound == LOWER and value > alpha:
+            alpha = value
+        elif bound == UPPER and value < beta:
+            beta = value
+        if alpha >= beta:
+            return entry.move or 0, alpha, beta, (value, entry.move)
+    return entry.move or 0, alpha, beta, None
+
+
+def store_tt(tt, pos, depth, value, alpha_orig, beta_orig, sign, best_move):
+    """Store a node's result, bounded against the window it was searched with."""
+    if tt is None:
+        return
+    if value <= alpha_orig:
+        bound = UPPER
+    elif value >= beta_orig:
+        bound = LOWER
+    else:
+        bound = EXACT
+    tt.store(pos.key, depth, sign * value, to_tt_bound(bound, sign), best_move)
+
+
+# --- Selective search ---
+def try_null_move(options, pos, depth, ply, prev_move, in_check, static_score, alpha, beta,
+                  maximizing_player):
+    """
+    Null move: if passing still fails high, a real move surely would. Only
+    worth trying when the static score is already past the side's bound.
+    """
+    if not options.try_null_move(pos, depth, ply, prev_move, in_check):
+        return False
+    if maximizing_player:
+        return beta != INFINITY and static_score >= beta
+    return alpha != -INFINITY and static_score <= alpha
+
+
+def null_move_window(alpha, beta, maximizing_player):
+    """Null window just past the side's bound: does passing still fail high?"""
+    return (beta - 1, beta) if maximizing_player else (alpha, alpha + 1)
+
+
+def scout_window(alpha, beta, maximizing_player):
+    """Null window at the side's bound: does a reduced move beat it?"""
+    return (alpha, alpha + 1) if maximizing_player else (beta - 1, beta)
+
+
+def can_scout(alpha, beta, maximizing_player):
+    """
+    Whether the side's bound is finite. While it is still open the null
+    window degenerates, every reduced move would seem to beat it, and the
+    reduced search would only be repeated at full depth.
+    """
+    return alpha != -INFINITY if maximizing_player else beta != INFINITY
+
+
+def futility_score(options, depth, in_check, static_score, maximizing_player):
+    """The best a quiet move is assumed to reach near the leaves, or None when nothing is pruned."""
+    margin = options.futility_margin(depth)
+    if margin is None or in_check:
+        return None
+    return static_score + margin if maximizing_player else static_score - margin
+
+
+def is_futile(futility, alpha, beta, maximizing_player):
+    if futility is None:
+        return False
+    return futility <= alpha if maximizing_player else futility >= beta
+
+
+def selective_candidate(options, pos, move, searched, in_check):
+    """
+    Whether move, not yet made, may be pruned or reduced: a quiet move after
+    the first, out of check. Captures, promotions, evasions and (checked by
+    the caller once the move is made) checking moves are never pruned or
+    reduced.
+    """
+    return options is not None and searched and not in_check and not pos.is_tactical(move)
+
+
+# --- Iterative deepening ---
+def deepen(pos, depths, search, time_manager, stats=None, tt=None, principal_variation=None):
+    """
+    Run search(root, depth) -> (score, move) for each of depths while the
+    time manager allows a new iteration. An iteration cut off by the hard
+    limit is thrown away and the move of the last completed one is kept.
+
+    Completed iterations are reported to stats with their principal
+    variation: principal_variation(root, depth, move) if given, else the
+    line stored in tt.
+    """
+    best_move = None
+    for depth in depths:
+        if best_move is not None and not time_manager.can_start_iteration():
+            break
+        # Each iteration gets its own copy, since a timeout leaves it mid-line
+        root = pos.copy()
+        if stats is not None:
+            stats.begin_iteration()
+        try:
+            score, move = search(root, depth)
+        except SearchTimeout:
+            break
+        if move:
+            best_move = move
+        if stats is not None:
+            if principal_variation is not None:
+                pv = principal_variation(root, depth, move)
+            else:
+                pv = tt_pv(root, tt, depth) if tt is not None else [move] if move else []
+            stats.end_iteration(depth, score, pv_strings(pv))
+    if best_move is None:
+        # Not even the first iteration finished: any legal move beats none
+        moves = pos.generate_legal_moves()
+        best_move = moves[0] if moves else None
+    return best_move
@@ -0,0 +1,95 @@
+# search_options.py – Tunable selective search settings for the alpha-beta engines
+
+
+class SearchOptions:
+    """
+    Switches and parameters for the selective parts of the search. Each
+    technique can be turned off on its own; SearchOptions.full_width()
+    turns them all off for a plain alpha-beta search. The engines' entry
+    points use DEFAULT_OPTIONS, with every technique on, when given none;
+    inside the search, options=None searches every move to full depth.
+
+    null_move: let the opponent move twice; if the reduced search still
+    fails high the node is cut. Skipped in check, right after another null
+    move, and when the side to move has only pawns (zugzwang).
+    late_move_reductions: quiet moves ordered after the first few are
+    searched shallower and re-searched at full depth only if they beat alpha.
+    check_extensions: a node in check is searched one ply deeper, as long
+    as the line stays within max_extended_ply.
+    futility_pruning: near the leaves, quiet moves are skipped when the
+    static score plus futility_margins[depth] cannot reach alpha.
+    tablebase: a tablebase.TablebaseService; positions below the root that
+    it covers are scored from the tables instead of searched, and a covered
+    root plays its DTZ-best move. None (the default) never probes.
+    """
+
+    __slots__ = ('null_move', 'null_move_reduction', 'null_move_min_depth',
+                 'late_move_reductions', 'lmr_min_depth', 'lmr_full_depth_moves',
+                 'lmr_reduction', 'check_extensions', 'max_extended_ply',
+                 'futility_pruning', 'futility_margins', 'tablebase')
+
+    def __init__(self, null_move=True, null_move_reduction=2, null_move_min_depth=3,
+                 late_move_reductions=True, lmr_min_depth=3, lmr_full_depth_moves=3,
+                 lmr_reduction=1, check_extensions=True, max_extended_ply=32,
+                 futility_pruning=True, futility_margins=(0, 200, 500), tablebase=None):
+        self.null_move = null_move
+        self.null_move_reduction = null_move_reduction
+        self.null_move_min_depth = null_move_min_depth
+        self.late_move_reductions = late_move_reductions
+        self.lmr_min_depth = lmr_min_depth
+        self.lmr_full_depth_moves = lmr_full_depth_moves
+        self.lmr_reduction = lmr_reduction
+        self.check_extensions = check_extensions
+        self.max_extended_ply = max_extended_ply
+        self.futility_pruning = futility_pruning
+        self.futility_margins = futility_margins
+        self.tablebase = tablebase
+
+    @classmethod
+    def full_width(cls):
+        return cls(null_move=False, late_move_reductions=False, check_extensions=False,
+                   futility_pruning=False)
+
+    def try_null_move(self, pos, depth, ply, prev_move, in_check):
+        """Whether this node may try a null move (the caller still checks the bound)."""
+        return (self.null_move and depth >= self.null_move_min_depth and ply > 0
+                and prev_move != 0 and not in_check and pos.has_non_pawn_material(pos.turn))
+
+    def null_move_depth(self, depth):
+        # Deeper nodes can afford one more ply of reduction
+        return max(0, depth - 1 - self.null_move_reduction - (depth > 6))
+
+    def extension(self, ply, depth, in_check):
+        if self.check_extensions and in_check and ply + depth < self.max_extended_ply:
+            return 1
+        return 0
+
+    def futility_margin(self, depth):
+        """Margin for futility pruning at this depth, or None when it does not apply."""
+        if self.futility_pruning and 0 < depth < len(self.futility_margins):
+            return self.futility_margins[depth]
+        return None
+
+    def tablebase_score(self, pos, ply):
+        """Side-to-move tablebase score for a node below the root, or None."""
+        if self.tablebase is None or ply == 0:
+            return None
+        return self.tablebase.score_position(pos, ply)
+
+    def tablebase_move(self, pos):
+        """The tablebase's move for the root position, or None."""
+        if self.tablebase is None:
+            return None
+        return self.tablebase.root_move(pos)
+
+    def reduction(self, depth, move_index, quiet):
+        """Plies to take off the move_index-th move (0-based) searched at this node."""
+        if (self.late_move_reductions and quiet and depth >= self.lmr_min_depth
+                and move_index >= self.lmr_full_depth_moves):
+            # Much later moves are even less likely to matter
+            extra = 1 if move_index >= 3 * self.lmr_full_depth_moves and depth > 4 else 0
+            return min(depth - 1, self.lmr_reduction + extra)
+        return 0
+
+
+DEFAULT_OPTIONS = SearchOptions()
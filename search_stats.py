@@ -0,0 +1,160 @@
+# search_stats.py – Optional search instrumentation shared by the engines
+#
+# Engines take stats=None and only touch it behind "if stats is not None",
+# so a search without statistics pays one comparison per node. Counters are
+# plain attributes bumped in place; derived figures are computed on demand.
+
+import json
+import math
+import time
+
+from chess_bridge import move_to_chess
+
+
+def pv_strings(moves):
+    """Packed moves -> UCI strings, for reports and JSON."""
+    return [move_to_chess(move).uci() for move in moves]
+
+
+def tt_pv(pos, tt, max_length):
+    """
+    The principal variation as recorded in the transposition table: the
+    stored move of each position from pos on, while it is legal and the
+    line does not repeat. pos is left unchanged.
+    """
+    line = []
+    undos = []
+    seen = set()
+    while len(line) < max_length and pos.key not in seen:
+        seen.add(pos.key)
+        entry = tt.probe(pos.key)
+        move = entry.move if entry is not None else None
+        if not move or not pos.is_legal(move):
+            break
+        line.append(move)
+        undos.append((move, pos.make_move(move)))
+    for move, undo in reversed(undos):
+        pos.unmake_move(move, undo)
+    return line
+
+
+def _jsonable(value):
+    # Mate scores of the minimax engines are infinite, which JSON cannot hold
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    return value
+
+
+class SearchStats:
+    """
+    Counters for one search: nodes (main search; tree steps for MCTS),
+    qnodes (quiescence; playout plies for MCTS), transposition table probes
+    and hits, and beta cutoffs, with how many came from the first move
+    searched. Each completed iteration is recorded with its depth, score,
+    PV, nodes, time, nodes per second and effective branching factor (its
+    nodes over the previous iteration's), and passed to callback if given.
+
+    The engines' stats argument takes one of these. Only a single-process
+    search is instrumented; with workers > 1 the worker processes keep no
+    statistics.
+    """
+
+    __slots__ = ('nodes', 'qnodes', 'tt_probes', 'tt_hits', 'cutoffs', 'first_move_cutoffs',
+                 'iterations', 'callback', 'start', 'iteration_start', 'iteration_nodes')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations = []
+        self.start = self.iteration_start = time.perf_counter()
+        self.iteration_nodes = 0
+
+    # --- Iterations ---
+    @property
+    def total_nodes(self):
+        return self.nodes + self.qnodes
+
+    def begin_iteration(self):
+        self.iteration_start = time.perf_counter()
+        self.iteration_nodes = self.total_nodes
+
+    def end_iteration(self, depth, score, pv=(), deepening=True):
+        """
+        Record a completed iteration; pv is a list of UCI strings. Searches
+        whose iterations do not go one ply deeper each time (MCTS batches)
+        pass deepening=False and get no branching factor.
+        """
+        elapsed = time.perf_counter() - self.iteration_start
+        nodes = self.total_nodes - self.iteration_nodes
+        previous = self.iterations[-1]['nodes'] if self.iterations and deepening else 0
+        record = {
+            'depth': depth,
+            'score': score,
+            'pv': list(pv),
+            'nodes': nodes,
+            'time': elapsed,
+            'nps': int(nodes / elapsed) if elapsed > 0 else 0,
+            'ebf': nodes / previous if previous else None,
+            'total_nodes': self.total_nodes,
+            'elapsed': time.perf_counter() - self.start,
+        }
+        self.iterations.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    # --- Derived figures ---
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of cutoffs made by the first move searched; a gauge of move ordering."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def effective_branching_factor(self):
+        return self.iterations[-1]['ebf'] if self.iterations else None
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        return {
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': self.tt_hit_rate,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate,
+            'ebf': self.effective_branching_factor,
+            'depth': self.iterations[-1]['depth'] if self.iterations else 0,
+            'time': elapsed,
+            'nps': int(self.total_nodes / elapsed) if elapsed > 0 else 0,
+        }
+
+    # --- Export ---
+    def write_jsonl(self, fp, **fields):
+        """
+        One JSON object per line: each iteration, then the summary. fields
+        (e.g. engine='killer', fen=...) are added to every line so logs from
+        many searches can be appended to one file and told apart.
+        """
+        for record in self.iterations:
+            line = dict(fields, type='iteration', **record)
+            fp.write(json.dumps({k: _jsonable(v) for k, v in line.items()}) + '\n')
+        line = dict(fields, type='summary', **self.summary())
+        fp.write(json.dumps({k: _jsonable(v) for k, v in line.items()}) + '\n')
+
+    def export_jsonl(self, path, **fields):
+        """Append this search to a JSON-lines file."""
+        with open(path, 'a', encoding='utf-8') as fp:
+            self.write_jsonl(fp, **fields)
@@ -0,0 +1,228 @@
+# tablebase.py – Cached Syzygy tablebase probing shared by the engines
+
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+import chess.syzygy
+
+from bitboard import PAWN, popcount
+from chess_bridge import move_from_chess, position_to_chess
+
+# Optional: Set to your Syzygy tablebase directory or None if unavailable
+TABLEBASE_PATH = None
+DEFAULT_CACHE_SIZE = 65536
+
+# Search score for a tablebase win: above any evaluation, below any mate
+TB_WIN_SCORE = 20000
+
+# Piece letters in Syzygy table names, strongest first, by bitboard piece type
+SIGNATURE_ORDER = ((4, 'Q'), (3, 'R'), (2, 'B'), (1, 'N'), (PAWN, 'P'))
+
+
+def wdl_to_score(wdl, ply=0):
+    """
+    Side-to-move score for a WDL value. Cursed wins and blessed losses
+    (+-1) are draws under the 50-move rule; wins found nearer the root
+    score higher.
+    """
+    if wdl >= 2:
+        return TB_WIN_SCORE - ply
+    if wdl <= -2:
+        return -TB_WIN_SCORE + ply
+    return 0
+
+
+class TablebaseService:
+    """
+    Syzygy probing behind bounded LRU caches keyed by position hash: one
+    per probe kind, and one for bitboard Positions, whose keys are not
+    Polyglot's. A position is only probed when its piece count is within
+    the largest table on disk and its material signature has a table, so
+    most positions are turned away without touching the files. Bare kings
+    are a draw without a probe. hits and misses count cache lookups of
+    positions that passed the gate.
+    """
+
+    def __init__(self, path=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.tablebase = None
+        self.tables = frozenset()
+        self.max_pieces = 0
+        self.cache_size = cache_size
+        self.wdl_cache = OrderedDict()
+        self.dtz_cache = OrderedDict()
+        self.position_cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        """Load the tables in path; a missing or unreadable directory leaves the service empty."""
+        self.close()
+        self.path = path
+        try:
+            self.tablebase = chess.syzygy.open_tablebase(path)
+        except Exception:
+            self.tablebase = None
+            return
+        self.tables = frozenset(chess.syzygy.normalize_tablename(name)
+                                for name in self.tablebase.wdl)
+        self.max_pieces = max((len(name) - 1 for name in self.tables), default=0)
+
+    def close(self):
+        if self.tablebase is not None:
+            self.tablebase.close()
+        self.tablebase = None
+        self.tables = frozenset()
+        self.max_pieces = 0
+        self.clear()
+
+    def clear(self):
+        self.wdl_cache.clear()
+        self.dtz_cache.clear()
+        self.position_cache.clear()
+        self.hits = self.misses = 0
+
+    @property
+    def available(self):
+        return self.max_pieces > 0
+
+    # Open tables cannot be pickled; a worker process reopens the directory
+    def __getstate__(self):
+        return {'path': self.path, 'cache_size': self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['cache_size'])
+
+    # --- Gating ---
+    def covers(self, board):
+        """Whether a python-chess board has a table to probe."""
+        if (not self.max_pieces or board.castling_rights
+                or chess.popcount(board.occupied) > self.max_pieces):
+            return False
+        return chess.syzygy.normalize_tablename(chess.syzygy.calc_key(board)) in self.tables
+
+    def covers_position(self, pos):
+        """Whether a bitboard Position has a table to probe, without converting it."""
+        if (not self.max_pieces or pos.castling
+                or popcount(pos.occupancy[0] | pos.occupancy[1]) > self.max_pieces):
+            return False
+        sides = []
+        for color in (0, 1):
+            letters = 'K'
+            for ptype, letter in SIGNATURE_ORDER:
+                letters += letter * popcount(pos.bitboards[color * 6 + ptype])
+            sides.append(letters)
+        return chess.syzygy.normalize_tablename('v'.join(sides)) in self.tables
+
+    # --- Probing ---
+    def _cached(self, cache, key, probe):
+        if key in cache:
+            self.hits += 1
+            cache.move_to_end(key)
+            return cache[key]
+        self.misses += 1
+        try:
+            value = probe()
+        except Exception:
+            value = None  # table missing or unreadable; remember that too
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def probe_wdl(self, board):
+        """WDL for the side to move of a python-chess board (2 win ... -2 loss), or None."""
+        if self.max_pieces and chess.popcount(board.occupied) == 2:
+            return 0  # K v K has no table of its own
+        if not self.covers(board):
+            return None
+        return self._cached(self.wdl_cache, chess.polyglot.zobrist_hash(board),
+                            lambda: self.tablebase.probe_wdl(board))
+
+    def probe_dtz(self, board):
+        if self.max_pieces and chess.popcount(board.occupied) == 2:
+            return 0
+        if not self.covers(board):
+            return None
+        return self._cached(self.dtz_cache, chess.polyglot.zobrist_hash(board),
+                            lambda: self.tablebase.probe_dtz(board))
+
+    def probe_position(self, pos):
+        """WDL for a bitboard Position, cached by its own Zobrist key; for search leaves."""
+        if self.max_pieces and popcount(pos.occupancy[0] | pos.occupancy[1]) == 2:
+            return 0
+        if not self.covers_position(pos):
+            return None
+        return self._cached(self.position_cache, pos.key,
+                            lambda: self.tablebase.probe_wdl(position_to_chess(pos)))
+
+    def score_position(self, pos, ply=0):
+        """Side-to-move search score for a bitboard Position, or None when not covered."""
+        wdl = self.probe_position(pos)
+        return None if wdl is None else wdl_to_score(wdl, ply)
+
+    def root_moves(self, board):
+        """
+        The legal moves of a python-chess board that keep its tablebase
+        result, best first by DTZ: the fastest conversion when winning,
+        the slowest when losing. None when the position is not covered.
+        """
+        if self.probe_wdl(board) is None:
+            return None
+        scored = []
+        for move in board.legal_moves:
+            board.push(move)
+            wdl = self.probe_wdl(board)
+            dtz = self.probe_dtz(board) if wdl is not None else None
+            if board.is_checkmate():
+                wdl, dtz = -2, 0
+            board.pop()
+            if wdl is None or dtz is None:
+                return None  # a child outside the tables: leave it to the search
+            # Child values are for the opponent; lower is better for us
+            scored.append((wdl_to_score(-wdl), move, dtz))
+        if not scored:
+            return None
+        best = max(score for score, _, _ in scored)
+        moves = [(dtz, move) for score, move, dtz in scored if score == best]
+        # Winning, the opponent's DTZ is negative and the one nearest zero
+        # converts fastest; losing, the largest one holds out longest
+        moves.sort(key=lambda entry: entry[0], reverse=True)
+        return [move for _, move in moves]
+
+    def root_move(self, pos):
+        """The DTZ-best packed move for a bitboard Position, or None when not covered."""
+        if not self.covers_position(pos):
+            return None
+        moves = self.root_moves(position_to_chess(pos))
+        return move_from_chess(moves[0]) if moves else None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'cached': len(self.wdl_cache) + len(self.dtz_cache) + len(self.position_cache)}
+
+
+# --- Shared service ---
+_shared_service = None
+
+
+def shared_service():
+    """The process-wide service, opened on TABLEBASE_PATH on first use."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = TablebaseService(TABLEBASE_PATH)
+    return _shared_service
+
+
+def configure(path, cache_size=DEFAULT_CACHE_SIZE):
+    """Point the shared service at a tablebase directory."""
+    global _shared_service
+    if _shared_service is not None:
+        _shared_service.close()
+    _shared_service = TablebaseService(path, cache_size)
+    return _shared_service
@@ -0,0 +1,64 @@
+# test_chess_bridge.py – ChessBoardSync against boards rebuilt from scratch
+#
+# Run with "python -m pytest". A game with castling, en passant and a
+# promotion is pushed through the sync one move at a time, and its board is
+# compared with board_to_chess on the nested-list board after every move.
+
+import chess
+
+from chess_bridge import ChessBoardSync, board_to_chess, chess_to_position, move_from_chess
+
+GAME = ('e2e4 g8f6 e4e5 d7d5 e5d6 e7d6 g1f3 f8e7 f1c4 e8g8 e1g1 b7b5 c4b5 c7c5 '
+        'b5a4 c5c4 b2b4 c4b3 a2a3 b3b2 h2h3 b2a1q').split()
+
+
+def packed(uci):
+    return move_from_chess(chess.Move.from_uci(uci))
+
+
+def play(pos, ucis):
+    for uci in ucis:
+        pos.make_move(packed(uci))
+    return pos
+
+
+def rebuilt_fen(pos):
+    turn = 'white' if pos.turn == 0 else 'black'
+    return board_to_chess(pos.to_board(), turn, pos.en_passant_target(), pos.castling_rights(),
+                          pos.halfmove_clock, pos.fullmove_number).fen()
+
+
+def test_push_matches_rebuilt_board():
+    pos = chess_to_position(chess.Board())
+    sync = ChessBoardSync(pos)
+    reference = chess.Board()
+    for uci in GAME:
+        sync.push(packed(uci))
+        pos.make_move(packed(uci))
+        reference.push_uci(uci)
+        assert sync.board.fen() == rebuilt_fen(pos) == reference.fen()
+
+
+def test_sync_follows_short_lines_and_rebuilds_otherwise():
+    start = chess_to_position(chess.Board())
+    sync = ChessBoardSync(start)
+    later = play(start.copy(), GAME[:2])
+    board = sync.sync(later)
+    assert board.move_stack == [chess.Move.from_uci(uci) for uci in GAME[:2]]
+    assert board.fen() == rebuilt_fen(later)
+
+    far = play(later.copy(), GAME[2:8])
+    board = sync.sync(far)
+    assert board.fen() == rebuilt_fen(far)
+    assert not board.move_stack  # too far for the line search, so rebuilt
+
+
+def test_pop_takes_back_the_last_move():
+    start = chess_to_position(chess.Board())
+    sync = ChessBoardSync(start)
+    for uci in GAME[:4]:
+        sync.push(packed(uci))
+    sync.pop()
+    expected = play(start.copy(), GAME[:3])
+    assert sync.board.fen() == rebuilt_fen(expected)
+    assert sync.position.key == expected.key
@@ -0,0 +1,98 @@
+# test_tablebase.py – Gating, caching and root move logic of TablebaseService
+#
+# Run with "python -m pytest". The Syzygy files are replaced by a stub that
+# knows KQvK only: the side with the queen wins, and every probe is counted.
+
+import chess
+import chess.syzygy
+import pytest
+
+import tablebase
+from chess_bridge import chess_to_position
+
+
+class StubTablebase:
+    def __init__(self):
+        self.wdl = {'KQvK': None}
+        self.probes = 0
+
+    def probe_wdl(self, board):
+        self.probes += 1
+        return 2 if board.pieces(chess.QUEEN, board.turn) else -2
+
+    def probe_dtz(self, board):
+        self.probes += 1
+        return 5 if board.pieces(chess.QUEEN, board.turn) else -5
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(chess.syzygy, 'open_tablebase', lambda path: StubTablebase())
+    return tablebase.TablebaseService('stub', cache_size=2)
+
+
+def test_open_reads_table_names(service):
+    assert service.available
+    assert service.max_pieces == 3
+    assert service.tables == {'KQvK'}
+
+
+def test_gating_turns_away_uncovered_positions(service):
+    uncovered = [
+        '8/8/8/8/8/2k5/8/K2R4 w - - 0 1',          # KRvK: no such table
+        '8/8/8/8/8/2k5/1p6/K2Q4 w - - 0 1',        # four pieces
+    ]
+    for fen in uncovered:
+        board = chess.Board(fen)
+        assert not service.covers(board)
+        assert not service.covers_position(chess_to_position(board))
+        assert service.probe_wdl(board) is None
+    assert service.tablebase.probes == 0
+    assert service.hits == service.misses == 0
+
+    board = chess.Board('8/8/8/8/8/2k5/8/K2Q4 w - - 0 1')
+    assert service.covers(board)
+    assert service.covers_position(chess_to_position(board))
+    # The signature is normalised, so the side with the queen does not matter
+    assert service.covers(board.mirror())
+
+
+def test_lru_evicts_least_recently_used(service):
+    boards = [chess.Board('8/8/8/8/8/2k5/8/K%dQ%d w - - 0 1' % (i, 6 - i)) for i in (1, 2, 3)]
+    for board in boards[:2]:
+        assert service.probe_wdl(board) == 2
+    service.probe_wdl(boards[0])      # boards[1] is now the oldest entry
+    service.probe_wdl(boards[2])      # and is evicted
+    assert (service.hits, service.misses, service.tablebase.probes) == (1, 3, 3)
+    service.probe_wdl(boards[0])
+    assert service.hits == 2
+    service.probe_wdl(boards[1])
+    assert service.tablebase.probes == 4
+    assert len(service.wdl_cache) == 2
+
+
+def test_position_probes_have_their_own_cache(service):
+    board = chess.Board('8/8/8/8/8/2k5/8/K2Q4 b - - 0 1')
+    pos = chess_to_position(board)
+    assert service.probe_wdl(board) == -2
+    assert service.probe_position(pos) == -2
+    assert service.score_position(pos, 3) == -tablebase.TB_WIN_SCORE + 3
+    assert len(service.wdl_cache) == len(service.position_cache) == 1
+    assert service.tablebase.probes == 2
+
+
+def test_bare_kings_are_a_draw(service):
+    board = chess.Board('8/8/8/8/8/2k5/8/K7 w - - 0 1')
+    assert service.probe_wdl(board) == 0
+    assert service.probe_position(chess_to_position(board)) == 0
+    assert tablebase.TablebaseService().probe_wdl(board) is None
+
+
+def test_root_moves_take_the_queen(service):
+    # Black in check can capture the unprotected queen into K v K
+    board = chess.Board('8/8/8/8/8/2k5/3Q4/K7 b - - 0 1')
+    assert service.root_moves(board) == [chess.Move.from_uci('c3d2')]
+    assert service.root_move(chess_to_position(board)) is not None
@@ -0,0 +1,94 @@
+# time_manager.py – Shared node-count based time control for the search engines
+
+import time
+
+# Nodes searched between clock reads; a read per node costs more than the node
+DEFAULT_CHECK_INTERVAL = 1024
+
+# Budgeting from the game clock (seconds)
+DEFAULT_MOVES_TO_GO = 30
+INCREMENT_SHARE = 0.75      # part of the increment spent on this move
+HARD_LIMIT_FACTOR = 3.0     # the hard limit may stretch the soft one this far
+MAX_CLOCK_SHARE = 0.4       # ...but never beyond this part of the remaining time
+MOVE_OVERHEAD = 0.05        # kept back for the GUI and the process to answer
+MIN_MOVE_TIME = 0.01
+
+# With only a fixed move time, an iteration started after this share of it
+# would rarely finish, since each one takes a few times longer than the last
+SOFT_SHARE_OF_MOVE_TIME = 0.5
+
+
+class SearchTimeout(Exception):
+    """Raised from inside a search once the hard limit has passed."""
+
+
+class TimeManager:
+    """
+    Soft and hard limits for one search. The soft limit is checked between
+    iterations: past it, no new iteration is started. The hard limit aborts
+    the running iteration by raising SearchTimeout from tick(), which the
+    driver catches before falling back to the last completed iteration.
+    The clock is read only every check_interval nodes.
+
+    A limit of None means unlimited, so TimeManager() never stops a search.
+    """
+
+    __slots__ = ('start', 'soft_limit', 'hard_limit', 'check_interval', 'nodes',
+                 'next_check', 'stopped')
+
+    def __init__(self, soft_limit=None, hard_limit=None, check_interval=DEFAULT_CHECK_INTERVAL):
+        if soft_limit is not None and hard_limit is not None:
+            soft_limit = min(soft_limit, hard_limit)
+        self.start = time.perf_counter()
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.check_interval = check_interval
+        self.nodes = 0
+        self.next_check = check_interval if hard_limit is not None else float('inf')
+        self.stopped = False
+
+    @classmethod
+    def for_move(cls, max_time=None, time_left=None, increment=0.0, moves_to_go=None,
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        Build limits for the next move. time_left and increment come from
+        the game clock; max_time is a fixed budget per move. Given both, the
+        tighter limits win. Given neither, the search is only depth-bound.
+        """
+        soft = hard = None
+        if time_left is not None:
+            usable = max(MIN_MOVE_TIME, time_left - MOVE_OVERHEAD)
+            soft = usable / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * INCREMENT_SHARE
+            hard = min(soft * HARD_LIMIT_FACTOR, usable * MAX_CLOCK_SHARE + increment)
+            hard = max(MIN_MOVE_TIME, min(hard, usable))
+            soft = max(MIN_MOVE_TIME, min(soft, hard))
+        if max_time is not None:
+            hard = max_time if hard is None else min(hard, max_time)
+            move_soft = max_time * SOFT_SHARE_OF_MOVE_TIME
+            soft = move_soft if soft is None else min(soft, move_soft)
+        return cls(soft, hard, check_interval)
+
+    @property
+    def limited(self):
+        return self.hard_limit is not None or self.soft_limit is not None
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def tick(self):
+        """Count a node; every check_interval nodes, enforce the hard limit."""
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.next_check = self.nodes + self.check_interval
+            if self.elapsed() >= self.hard_limit:
+                self.stopped = True
+                raise SearchTimeout()
+
+    def can_start_iteration(self):
+        """False once the soft (or hard) limit has passed or the search was aborted."""
+        if self.stopped:
+            return False
+        elapsed = self.elapsed()
+        if self.soft_limit is not None and elapsed >= self.soft_limit:
+            return False
+        return self.hard_limit is None or elapsed < self.hard_limit
@@ -0,0 +1,108 @@
+# transposition.py – Zobrist-keyed transposition table shared by the search engines
+
+from collections import namedtuple
+
+# Bound types: how the stored score relates to the true score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Scores are always stored from the side to move's point of view, so one
+# table can be shared by the minimax engines and negamax alike.
+TTEntry = namedtuple('TTEntry', ['key', 'depth', 'score', 'bound', 'move', 'generation'])
+
+# Rough CPython footprint of one stored entry (tuple, key int, move, slot)
+ENTRY_BYTES = 160
+DEFAULT_SIZE_MB = 16
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of two-slot buckets indexed by the low bits of the
+    Zobrist key. The first slot is depth-preferred: it is only replaced by
+    a search at least as deep, or by any search once the entry is from an
+    earlier move. The second slot always takes the newest entry, so recent
+    shallow results are not lost.
+    """
+
+    def __init__(self, size_mb=DEFAULT_SIZE_MB):
+        buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        # Round down to a power of two so the index is a mask
+        self.size = 1 << (buckets.bit_length() - 1)
+        self.mask = self.size - 1
+        self.depth_slots = [None] * self.size
+        self.always_slots = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        """Age existing entries so the next search may overwrite them."""
+        self.generation += 1
+
+    def clear(self):
+        self.depth_slots = [None] * self.size
+        self.always_slots = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key):
+        index = key & self.mask
+        entry = self.depth_slots[index]
+        if entry is not None and entry.key == key:
+            return entry
+        entry = self.always_slots[index]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move=None):
+        index = key & self.mask
+        current = self.depth_slots[index]
+        if move is None and current is not None and current.key == key:
+            move = current.move  # keep the best move we already knew
+        entry = TTEntry(key, depth, score, bound, move, self.generation)
+        if current is None or depth >= current.depth or current.generation != self.generation:
+            self.depth_slots[index] = entry
+        else:
+            self.always_slots[index] = entry
+
+    def hashfull(self):
+        """Permille of depth-preferred slots in use, sampled from the first 1000."""
+        sample = self.depth_slots[:1000]
+        return sum(1 for entry in sample if entry is not None) * 1000 // len(sample)
+
+
+# --- Shared tables ---
+# One table per engine: they score differently (quiescence or not, which
+# pruning, how mates are encoded), so one engine's entries would mislead
+# another's search of the same position.
+_shared_tables = {}
+_shared_size_mb = DEFAULT_SIZE_MB
+
+
+def shared_table(engine='default'):
+    """
+    The process-wide table an engine uses by default, so each new search
+    in a game starts with what its previous ones learned.
+    """
+    table = _shared_tables.get(engine)
+    if table is None:
+        table = _shared_tables[engine] = TranspositionTable(_shared_size_mb)
+    return table
+
+
+def reset_shared_table(engine=None, size_mb=None):
+    """
+    Start a new game with empty tables: engine's only, or every engine's
+    when engine is None. size_mb changes the budget of tables made from now on.
+    """
+    global _shared_size_mb
+    if size_mb is not None:
+        _shared_size_mb = size_mb
+    if engine is None:
+        _shared_tables.clear()
+    else:
+        _shared_tables.pop(engine, None)
+
+
+def to_tt_bound(bound, sign):
+    """Flip a bound between root-player and side-to-move perspectives."""
+    if sign < 0 and bound != EXACT:
+        return LOWER if bound == UPPER else UPPER
+    return bound